@@ -1,22 +1,17 @@
 import sys
 import os
-import time
-import json
-import base64
-import re
-import subprocess
-import io
-import ast
-from datetime import datetime, timedelta
-import requests
-from PIL import Image
+import threading
 
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                QHBoxLayout, QLabel, QComboBox, QLineEdit, 
-                               QPushButton, QTextEdit, QFileDialog, QMessageBox, QProgressBar)
-from PySide6.QtCore import Qt, QThread, Signal, QLocale, QUrl
+                               QPushButton, QPlainTextEdit, QFileDialog, QMessageBox, QProgressBar)
+from PySide6.QtCore import Qt, QThread, Signal, QLocale, QUrl, QTimer
 from PySide6.QtGui import QDragEnterEvent, QDropEvent, QCloseEvent, QDesktopServices,QIcon
 
+from gvs.config import DEFAULT_OPTIONS, OUTPUT_DIR, ensure_dir, load_config, save_config, options_from_config
+from gvs.i18n import tr, set_language
+from gvs.job import SubtitleJob
+
 def resource_path(relative_path):
     try:
         # PyInstaller 创建临时文件夹，将路径存储在 _MEIPASS 中
@@ -26,30 +21,6 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-if sys.platform == 'win32':
-    if getattr(sys, 'frozen', False):
-        application_path = os.path.dirname(sys.executable)
-    else:
-        application_path = os.path.dirname(os.path.abspath(__file__))
-
-    os.environ['PATH'] = application_path + os.pathsep + os.environ['PATH']
-
-
-if getattr(sys, 'frozen', False):
-    ROOT_DIR = os.path.dirname(sys.executable)
-else:
-    ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
-
-
-
-
-OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
-
-CONFIG_FILE = os.path.join(ROOT_DIR, "config.json")
-DEBUG_LOG_FILE = os.path.join(ROOT_DIR, "api_debug.log")
-
 def get_system_language():
     """获取系统语言，返回 'zh' 或 'en'"""
     sys_lang = QLocale.system().name().lower() # 例如 zh_cn, en_us
@@ -58,436 +29,44 @@ def get_system_language():
         return 'zh'
     return 'en'
 
-LANG = get_system_language()
-
-TRANS = {
-    "zh": {
-        "title": "GVS 字幕提取 AI (v1.0)",
-        "No subtitles were generated":"未生成字幕，请查看错误日志",
-        "drop_hint": "拖拽或点击选择视频到此处",
-        "region": "区域:",
-        "provider": "服务:",
-        "model": "模型:",
-        "key_placeholder": "请输入 API Key (明文显示)",
-        "zhipu_key_ph": "请输入智谱 API Key",
-        "gemini_key_ph": "请输入 Google API Key",
-        "start_btn": "开始提取",
-        "stop_btn": "停止",
-        "open_dir_btn": "打开输出目录",
-        "ready": "已就绪: {}",
-        "load_file": "加载文件: {}",
-        "select_video": "选择视频",
-        "msg_hint": "提示",
-        "msg_no_video": "请先选择视频",
-        "msg_no_key": "请输入 {} 的API Key",
-        "task_start": "=== 开始任务: {} ===",
-        "service_info": "服务: {} | 模型: {}",
-        "ffmpeg_error": "❌ 无法获取视频时长，请检查 ffmpeg。",
-        "video_info": "视频时长: {}秒，每批次处理 {} 秒",
-        "user_abort": "🛑 任务被用户中止。",
-        "ai_analyzing": "🔍 AI分析中: {} -> {}",
-        "smart_merge": "🔗 智能拼接: ...{}",
-        "save_success": "✅ 字幕已保存至: {}",
-        "save_fail": "❌ 保存SRT失败: {}",
-        "fatal_error": "❌ 严重错误: {}",
-        "api_fail": "❌ API 请求失败 (尝试 {}/3): {}",
-        "rate_limit": "⚠️ 触发限流，暂停10秒...",
-        "common_error": "⚠️ 常规错误，2秒后重试...",
-        "stop_confirm_title": "任务运行中",
-        "stop_confirm_msg": "任务正在运行，确定要强制退出吗？",
-        "stopping": "正在停止...",
-        "force_stop": "正在强制终止线程...",
-        "regions": ["全画面", "底部", "中部", "顶部"],
-        "providers": ["智谱AI", "Gemini"]
-    },
-    "en": {
-        "No subtitles were generated":"No subtitles were generated. Please check the error log",
-        "title": "GVS Subtitle AI (v1.0)",
-        "drop_hint": "Drag & Drop &Click Video Here",
-        "region": "Region:",
-        "provider": "Service:",
-        "model": "Model:",
-        "key_placeholder": "Enter API Key (Plain Text)",
-        "zhipu_key_ph": "Enter Zhipu API Key",
-        "gemini_key_ph": "Enter Google API Key",
-        "start_btn": "Start",
-        "stop_btn": "Stop",
-        "open_dir_btn": "Open Output Dir",
-        "ready": "Ready: {}",
-        "load_file": "File Loaded: {}",
-        "select_video": "Select Video",
-        "msg_hint": "Hint",
-        "msg_no_video": "Please select a video first",
-        "msg_no_key": "Please enter API Key for {}",
-        "task_start": "=== Task Started: {} ===",
-        "service_info": "Service: {} | Model: {}",
-        "ffmpeg_error": "❌ Cannot get video duration. Check ffmpeg.",
-        "video_info": "Duration: {}s, Batch Size: {}s",
-        "user_abort": "🛑 Task aborted by user.",
-        "ai_analyzing": "🔍 AI Analyzing: {} -> {}",
-        "smart_merge": "🔗 Smart Merge: ...{}",
-        "save_success": "✅ SRT Saved: {}",
-        "save_fail": "❌ Failed to save SRT: {}",
-        "fatal_error": "❌ Fatal Error: {}",
-        "api_fail": "❌ API Failed (Attempt {}/3): {}",
-        "rate_limit": "⚠️ Rate limit hit, pausing 10s...",
-        "common_error": "⚠️ Error, retrying in 2s...",
-        "stop_confirm_title": "Task Running",
-        "stop_confirm_msg": "Task is running. Force quit?",
-        "stopping": "Stopping...",
-        "force_stop": "Forcing thread termination...",
-        "regions": ["Full Screen", "Bottom", "Middle", "Top"],
-        "providers": ["Zhipu AI", "Gemini"]
-    }
-}
-
-def tr(key):
-    return TRANS[LANG].get(key, key)
-
-def log_debug(content):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(DEBUG_LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {content}\n{'-'*50}\n")
-
-def load_config():
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            pass
-    return {}
-
-def save_config(new_data):
-    current = load_config()
-    current.update(new_data)
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(current, f, ensure_ascii=False, indent=2)
-    except:
-        pass
-
-
-def ms_to_srt_time(seconds):
-    td = timedelta(seconds=seconds)
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    secs = total_seconds % 60
-    millis = int(td.microseconds / 1000)
-    return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
-
-def extract_frame_ffmpeg(video_path, time_sec):
-    try:
-        cmd = [
-            'ffmpeg', '-ss', str(time_sec), '-i', video_path,
-            '-vframes', '1', '-q:v', '2', '-f', 'image2', 'pipe:1'
-        ]
-        startupinfo = None
-        if os.name == 'nt':
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo, check=False)
-        return result.stdout if result.returncode == 0 else None
-    except:
-        return None
-
-def crop_image_bytes(img_bytes, region_idx):
-    """
-    根据索引裁切图片
-    region_idx: 0=全画面, 1=底部, 2=中部, 3=顶部
-    """
-    if not img_bytes: return None
-    try:
-        img = Image.open(io.BytesIO(img_bytes))
-        w, h = img.size
-        
-        # 默认全画面
-        y_start, y_end = 0, h
-            
-        if region_idx == 1: # 底部 (取下 1/3)
-            y_start = int(h * 0.66)
-        elif region_idx == 3: # 顶部 (取上 1/3)
-            y_end = int(h * 0.33)
-        elif region_idx == 2: # 中部 (取中间 1/3)
-            y_start = int(h * 0.33)
-            y_end = int(h * 0.66)
-        # region_idx == 0: 全画面，不做改变
-        
-        crop_box = (0, y_start, w, y_end)
-        cropped_img = img.crop(crop_box)
-        
-        cw, ch = cropped_img.size
-        # 如果图片过小，进行放大，提高OCR准确率
-        if ch < 100:
-            cropped_img = cropped_img.resize((int(cw * 2), int(ch * 2)), Image.Resampling.BICUBIC)
-            
-        out_buffer = io.BytesIO()
-        cropped_img.save(out_buffer, format='JPEG', quality=95)
-        return base64.b64encode(out_buffer.getvalue()).decode('utf-8')
-    except:
-        return None
-
-def get_video_duration_ffmpeg(video_path):
-    try:
-        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', video_path]
-        startupinfo = None
-        if os.name == 'nt':
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
-        return float(result.stdout)
-    except:
-        return 0.0
-
-
-class AIClient:
-    def __init__(self, provider_idx, api_key, model, log_signal):
-        self.provider_idx = provider_idx # 0=智谱, 1=Gemini
-        self.api_key = api_key
-        self.model = model
-        self.log_signal = log_signal
-
-    def chat_smart_batch(self, images_base64, start_sec):
-        count = len(images_base64)
-        
-        prompt_text = (
-            f"I provide {count} chronological video frames.\n"
-            f"The first image corresponds to timestamp {start_sec} seconds.\n"
-            f"The images are sampled at 1 frame per second (1 fps).\n"
-            "Your task:\n"
-            "1. Identify hard subtitles in the images.\n"
-            "2. MERGE continuous identical subtitles into a single entry.\n"
-            "3. Return a JSON list. Format: [{\"start\": 10, \"end\": 12, \"text\": \"Content\"}]\n"
-            "4. Use DOUBLE QUOTES for keys and strings.\n"
-            "5. If no subtitle, do not include in list.\n"
-            "6. Output ONLY the JSON string."
-        )
-
-        for i in range(3): 
-            try:
-                resp_text = ""
-                if self.provider_idx == 0: # 智谱
-                    resp_text = self._call_zhipu(prompt_text, images_base64)
-                elif self.provider_idx == 1: # Gemini
-                    resp_text = self._call_gemini_rest(prompt_text, images_base64)
-                
-                log_debug(f"Batch {start_sec}s - Response:\n{resp_text}")
-                
-                clean_json = resp_text.replace("```json", "").replace("```", "").strip()
-                
-                try:
-                    data = json.loads(clean_json)
-                except json.JSONDecodeError:
-                    try:
-                        data = ast.literal_eval(clean_json)
-                    except Exception as e:
-                        log_debug(f"JSON Parse Error: {e}\nRaw content: {clean_json}")
-                        return []
-                
-                if isinstance(data, list):
-                    return data
-                else:
-                    return []
-
-            except Exception as e:
-                err_str = str(e)
-                log_debug(f"API Error: {err_str}")
-                
-                self.log_signal.emit(tr("api_fail").format(i+1, err_str))
-
-                if "429" in err_str or "quota" in err_str or "exhausted" in err_str:
-                    self.log_signal.emit(tr("rate_limit"))
-                    time.sleep(10)
-                else:
-                    self.log_signal.emit(tr("common_error"))
-                    time.sleep(2)
-        return []
-
-    def _call_zhipu(self, prompt, images_base64):
-        url = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        content = [{"type": "text", "text": prompt}]
-        for img in images_base64:
-            content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}"}})
-        data = {"model": self.model, "messages": [{"role": "user", "content": content}], "temperature": 0.05}
-        
-        resp = requests.post(url, json=data, headers=headers, timeout=60,verify=False)
-        
-        if resp.status_code != 200:
-            try:
-                err_msg = resp.json()["error"]["message"]
-            except:
-                err_msg = resp.text
-            raise Exception(f"HTTP {resp.status_code}: {err_msg}")
-            
-        return resp.json()["choices"][0]["message"]["content"].strip()
-
-    def _call_gemini_rest(self, prompt, images_base64):
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent?key={self.api_key}"
-        headers = {"Content-Type": "application/json"}
-        parts = [{"text": prompt}]
-        for img in images_base64:
-            parts.append({"inline_data": {"mime_type": "image/jpeg", "data": img}})
-        
-        data = {
-            "contents": [{"parts": parts}], 
-            "generationConfig": {"temperature": 0.05}
-        }
-        
-        resp = requests.post(url, json=data, headers=headers, timeout=60,verify=False)
-        
-        if resp.status_code != 200:
-            try:
-                err_msg = resp.json()["error"]["message"]
-            except:
-                err_msg = resp.text
-            raise Exception(f"Gemini Error {resp.status_code}: {err_msg}")
-            
-        try:
-            return resp.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
-        except:
-            try:
-                feedback = resp.json()["promptFeedback"]
-                raise Exception(f"Safety Block: {feedback}")
-            except:
-                raise Exception(f"Invalid Structure: {resp.text[:100]}...")
+set_language(get_system_language())
 
 
 class Processor(QThread):
-    log = Signal(str)
-    progress = Signal(int, int)
+    """
+    在后台线程中运行 SubtitleJob
+    日志与进度只写入缓冲区 (不跨线程发信号)，由界面定时器调用 drain() 批量取走
+    """
     finished = Signal()
     
-    def __init__(self, video_path, region_idx, api_key, model, provider_idx):
+    def __init__(self, video_path, region_idx, api_key, model, provider_idx, options=None):
         super().__init__()
-        self.video_path = video_path
-        self.region_idx = region_idx # int
-        self.api_key = api_key
-        self.model = model
-        self.provider_idx = provider_idx # int
-        self.running = True
-        self.BATCH_SIZE = 20
+        self.lock = threading.Lock()
+        self.pending = []
+        self.latest = None
+        self.job = SubtitleJob(video_path, region_idx, api_key, model, provider_idx, options,
+                               log=self.on_log, progress=self.on_progress)
+
+    def on_log(self, s):
+        with self.lock:
+            self.pending.append(s)
+
+    def on_progress(self, current, total):
+        self.latest = (current, total)
+
+    def drain(self):
+        """取走积压的日志行与最新进度: (lines, (current, total) 或 None)"""
+        with self.lock:
+            lines, self.pending = self.pending, []
+        latest, self.latest = self.latest, None
+        return lines, latest
 
     def run(self):
-        provider_name = tr("providers")[self.provider_idx]
-        self.log.emit(tr("task_start").format(os.path.basename(self.video_path)))
-        self.log.emit(tr("service_info").format(provider_name, self.model))
-        
-        duration = get_video_duration_ffmpeg(self.video_path)
-        if duration == 0:
-            self.log.emit(tr("ffmpeg_error"))
-            self.finished.emit()
-            return
-        total_seconds = int(duration)
-        self.log.emit(tr("video_info").format(total_seconds, self.BATCH_SIZE))
-
-        try:
-            client = AIClient(self.provider_idx, self.api_key, self.model, self.log)
-            final_subtitles = []
-            
-            batch_imgs = []
-            batch_start_sec = 0
-            
-            for sec in range(total_seconds + 1):
-                if not self.running: 
-                    self.log.emit(tr("user_abort"))
-                    break
-                
-                if len(batch_imgs) == 0:
-                    batch_start_sec = sec
-                    
-                img_bytes = extract_frame_ffmpeg(self.video_path, sec)
-                if img_bytes:
-                    b64 = crop_image_bytes(img_bytes, self.region_idx)
-                    if b64:
-                        batch_imgs.append(b64)
-                
-                self.progress.emit(sec, total_seconds)
-                
-                if len(batch_imgs) >= self.BATCH_SIZE:
-                    self.process_smart_batch(client, batch_imgs, batch_start_sec, final_subtitles)
-                    batch_imgs = []
-            
-            if batch_imgs and self.running:
-                self.process_smart_batch(client, batch_imgs, batch_start_sec, final_subtitles)
-                
-            if self.running:
-                if not final_subtitles:
-                    raise RuntimeError(tr("No subtitles were generated"))
-                self.save_srt(final_subtitles)
-
-        except Exception as e:
-            self.log.emit(tr("fatal_error").format(str(e)))
-            import traceback
-            traceback.print_exc()
-            
+        self.job.run()
         self.finished.emit()
 
-    def process_smart_batch(self, client, imgs, start_sec, final_subtitles):
-        if not self.running: return
-
-        end_sec = start_sec + len(imgs)
-        self.log.emit(tr("ai_analyzing").format(ms_to_srt_time(start_sec), ms_to_srt_time(end_sec)))
-        
-        ai_results = client.chat_smart_batch(imgs, start_sec)
-        
-        if not ai_results:
-            return
-
-        for item in ai_results:
-            text = item.get('text', '').strip()
-            if not text or self.is_junk(text): continue
-            
-            s_time = float(item.get('start', 0))
-            e_time = float(item.get('end', 0))
-            
-            if final_subtitles:
-                last_global = final_subtitles[-1]
-                if self.is_same_sentence(last_global['text'], text):
-                    if abs(s_time - last_global['end']) <= 2.5: 
-                        self.log.emit(tr("smart_merge").format(text[-5:]))
-                        last_global['end'] = max(last_global['end'], e_time)
-                        continue 
-            
-            final_subtitles.append({"start": s_time, "end": e_time, "text": text})
-
-    def is_same_sentence(self, t1, t2):
-        def clean(s): return re.sub(r'[^\w]', '', s).lower()
-        return clean(t1) == clean(t2)
-
-    def is_junk(self, text):
-        if not text: return True
-        low = text.lower()
-        if "no subtitle" in low: return True
-        if "no text" in low: return True
-        if text == "[EMPTY]": return True
-        return False
-
-    def save_srt(self, subs):
-        # 1. 确定文件名
-        base_name = os.path.splitext(os.path.basename(self.video_path))[0]
-        srt_name = f"{base_name}.srt"
-        full_path = os.path.join(OUTPUT_DIR, srt_name)
-        
-        # 2. 检查重名，不覆盖
-        if os.path.exists(full_path):
-            timestamp = datetime.now().strftime("%H%M%S")
-            srt_name = f"{base_name}-{timestamp}.srt"
-            full_path = os.path.join(OUTPUT_DIR, srt_name)
-
-        try:
-            with open(full_path, "w", encoding="utf-8") as f:
-                for i, s in enumerate(subs):
-                    f.write(f"{i+1}\n")
-                    f.write(f"{ms_to_srt_time(s['start'])} --> {ms_to_srt_time(s['end'])}\n")
-                    f.write(f"{s['text']}\n\n")
-            self.log.emit(tr("save_success").format(full_path))
-        except Exception as e:
-            self.log.emit(tr("save_fail").format(str(e)))
-
     def stop(self):
-        self.running = False
+        self.job.stop()
 
 
 class MainWindow(QMainWindow):
@@ -496,6 +75,8 @@ class MainWindow(QMainWindow):
         self.setWindowTitle(tr("title"))
         self.resize(850, 700)
         self.worker = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
         icon_path = resource_path("ico.ico") 
         self.setWindowIcon(QIcon(icon_path))
 
@@ -521,7 +102,7 @@ class MainWindow(QMainWindow):
             QPushButton#btnOpenDir:hover { background-color: #70747a; }
             QProgressBar { border: 1px solid #555; border-radius: 4px; text-align: center; background-color: #1e1e1e; }
             QProgressBar::chunk { background-color: #5cb85c; width: 10px; }
-            QTextEdit { background-color: #1e1e1e; border: 1px solid #444; color: #0f0; font-family: Consolas; font-size: 12px; }
+            QPlainTextEdit { background-color: #1e1e1e; border: 1px solid #444; color: #0f0; font-family: Consolas; font-size: 12px; }
         """)
 
     def setup_ui(self):
@@ -586,7 +167,9 @@ class MainWindow(QMainWindow):
         
         self.pbar = QProgressBar(); self.pbar.setValue(0)
         layout.addWidget(self.pbar)
-        self.log_box = QTextEdit(); self.log_box.setReadOnly(True)
+        self.log_box = QPlainTextEdit(); self.log_box.setReadOnly(True)
+        # 只保留最近的若干行，长视频的日志不会无限增长
+        self.log_box.setMaximumBlockCount(int(load_config().get("gui_log_max_lines", DEFAULT_OPTIONS["gui_log_max_lines"])))
         layout.addWidget(self.log_box)
         self.setAcceptDrops(True)
 
@@ -609,7 +192,7 @@ class MainWindow(QMainWindow):
 
     def open_output_dir(self):
         """打开输出目录"""
-        QDesktopServices.openUrl(QUrl.fromLocalFile(OUTPUT_DIR))
+        QDesktopServices.openUrl(QUrl.fromLocalFile(ensure_dir(OUTPUT_DIR)))
 
     def load_settings(self):
         cfg = load_config()
@@ -650,7 +233,15 @@ class MainWindow(QMainWindow):
         self.log(tr("load_file").format(path))
 
     def log(self, s):
-        self.log_box.append(s); sb = self.log_box.verticalScrollBar(); sb.setValue(sb.maximum())
+        self.log_box.appendPlainText(s); sb = self.log_box.verticalScrollBar(); sb.setValue(sb.maximum())
+
+    def refresh(self):
+        """定时把后台任务积压的日志一次性追加，进度只取最新值"""
+        if not self.worker: return
+        lines, latest = self.worker.drain()
+        if lines: self.log("\n".join(lines))
+        if latest:
+            self.pbar.setMaximum(latest[1]); self.pbar.setValue(latest[0])
 
     def start(self):
         if not hasattr(self, 'video_path'): return QMessageBox.warning(self, tr("msg_hint"), tr("msg_no_video"))
@@ -673,11 +264,11 @@ class MainWindow(QMainWindow):
         self.btn_start.setEnabled(False); self.btn_stop.setEnabled(True)
         self.log_box.clear(); self.pbar.setValue(0)
         
-        # 传入 region_idx 和 provider_idx (均为 int)
-        self.worker = Processor(self.video_path, self.region_combo.currentIndex(), key, self.model_combo.currentText(), p_idx)
-        self.worker.log.connect(self.log)
-        self.worker.progress.connect(lambda c, t: (self.pbar.setMaximum(t), self.pbar.setValue(c)))
+        # 传入 region_idx 和 provider_idx (均为 int)，高级选项取自 config.json
+        options = options_from_config(load_config())
+        self.worker = Processor(self.video_path, self.region_combo.currentIndex(), key, self.model_combo.currentText(), p_idx, options)
         self.worker.finished.connect(self.on_finished)
+        self.refresh_timer.start(max(20, int(options.get("gui_refresh_ms", DEFAULT_OPTIONS["gui_refresh_ms"]))))
         self.worker.start()
 
     def stop(self):
@@ -687,6 +278,8 @@ class MainWindow(QMainWindow):
             self.btn_stop.setEnabled(False)
 
     def on_finished(self):
+        self.refresh_timer.stop()
+        self.refresh()
         self.btn_start.setEnabled(True)
         self.btn_stop.setEnabled(False)
         self.worker = None
@@ -0,0 +1,64 @@
+"""
+截帧方式基准测试：逐秒 ffmpeg 截帧 (seek) vs 单进程流式解码 (stream) vs 按关键帧分段并行解码 (segments)
+
+用法:
+    python benchmarks/bench_extract.py video.mp4 [--seconds 120] [--region 1] [--segments 4]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gvs.media import (iter_frames_seek, iter_frames_stream, iter_frames_segments, plan_segments,
+                       probe_video, encode_image_b64)
+
+
+def run_mode(mode, video_path, seconds, region_idx, segments=4):
+    start = time.perf_counter()
+    frames = 0
+    payload = 0
+    if mode == "seek":
+        it = iter_frames_seek(video_path, seconds, region_idx)
+    elif mode == "segments":
+        # 关键帧索引的耗时计入本模式
+        info = probe_video(video_path, keyframes=True)
+        plan = plan_segments(info["keyframes"] if info else [], 0, seconds + 1, segments, min_seconds=1)
+        plan[-1] = (plan[-1][0], seconds + 1)
+        it = iter_frames_segments(video_path, region_idx, plan, threads=max(1, (os.cpu_count() or 1) // len(plan)),
+                                  workers=len(plan))
+    else:
+        it = iter_frames_stream(video_path, region_idx, duration=seconds + 1)
+    for _, img in it:
+        b64 = encode_image_b64(img)
+        if b64:
+            frames += 1
+            payload += len(b64)
+    return frames, payload, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--seconds", type=int, default=120, help="测试的视频时长 (秒)")
+    parser.add_argument("--region", type=int, default=1, help="裁切区域 0=全画面 1=底部 2=中部 3=顶部 (自动区域请先用 gvs.band 检测)")
+    parser.add_argument("--segments", type=int, default=min(8, max(2, (os.cpu_count() or 1) // 2)), help="分段并行解码的段数")
+    parser.add_argument("--skip-seek", action="store_true", help="跳过最慢的 seek 方式")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("seek", "stream", "segments"):
+        if mode == "seek" and args.skip_seek: continue
+        frames, payload, wall = run_mode(mode, args.video, args.seconds, args.region, args.segments)
+        results[mode] = wall
+        print(f"{mode:>6}: {frames} 帧, {wall:.2f}s, {frames / wall if wall else 0:.1f} 帧/s, base64 {payload / 1024:.0f} KB")
+
+    if results["stream"] and "seek" in results:
+        print(f"stream 相对 seek 加速比: {results['seek'] / results['stream']:.1f}x")
+    if results["segments"]:
+        print(f"segments 相对 stream 加速比: {results['stream'] / results['segments']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+核心包导入耗时测量：每个模块在全新解释器中导入，扣除空解释器启动时间
+
+同时检查导入后没有加载 PySide6 / PIL / requests，且没有创建 output 等目录。
+加 --check 时任一模块超出预算或违反上述约束则返回非零退出码，可用于防止回退。
+
+用法:
+    python benchmarks/bench_import.py [--runs 5] [--budget-ms 30] [--check]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["gvs", "gvs.srt", "gvs.config", "gvs.i18n", "gvs.media", "gvs.mosaic", "gvs.batching", "gvs.band", "gvs.refine", "gvs.metrics", "gvs.router", "gvs.probecache", "gvs.payload", "gvs.ai", "gvs.job"]
+HEAVY = ["PySide6", "PIL", "requests", "urllib3"]
+
+PROBE = r"""
+import os, sys, time, json
+before = set(os.listdir(ROOT))
+t = time.perf_counter()
+if MODULE:
+    __import__(MODULE)
+elapsed = time.perf_counter() - t
+print(json.dumps({
+    "ms": elapsed * 1000,
+    "heavy": sorted(m for m in HEAVY if m in sys.modules),
+    "created": sorted(set(os.listdir(ROOT)) - before),
+}))
+"""
+
+
+def probe(module):
+    code = f"ROOT = {ROOT!r}\nMODULE = {module!r}\nHEAVY = {HEAVY!r}\n" + PROBE
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="每个模块重复测量次数，取最小值")
+    parser.add_argument("--budget-ms", type=float, default=30.0, help="单个模块的导入耗时预算")
+    parser.add_argument("--check", action="store_true", help="超出预算或有副作用时返回 1")
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        results = [probe(module) for _ in range(args.runs)]
+        best = min(r["ms"] for r in results)
+        problems = []
+        if best > args.budget_ms:
+            problems.append(f"超出预算 {args.budget_ms:.0f}ms")
+        heavy = sorted({m for r in results for m in r["heavy"]})
+        if heavy:
+            problems.append(f"加载了 {', '.join(heavy)}")
+        created = sorted({f for r in results for f in r["created"]})
+        if created:
+            problems.append(f"创建了 {', '.join(created)}")
+        failed = failed or bool(problems)
+        print(f"{module:<12} {best:7.1f} ms  {'; '.join(problems) or 'OK'}")
+
+    if args.check and failed:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
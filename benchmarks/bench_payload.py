@@ -0,0 +1,156 @@
+"""
+请求体内存基准测试：旧方式 (帧即编码为 base64 字符串，requests json= 整体序列化) vs 低拷贝方式
+(帧保留为 JPEG 字节，发送时由 StreamingJSONBody 边编码边写入连接)
+
+每种方式在独立子进程中对本地模拟服务发送一个批次，报告从编码帧到请求返回期间的
+峰值 RSS 增量 (/proc/self/statm 采样，仅 Linux) 与 Python 分配峰值 (tracemalloc)。
+帧为随机噪声图 (JPEG 几乎无法压缩，接近最坏情况)。
+
+用法:
+    python benchmarks/bench_payload.py [--frames 20] [--width 1920] [--height 1080] [--provider 0]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ("legacy", "stream")
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class RssSampler:
+    """后台线程每 2ms 采样一次 RSS，记录峰值"""
+    def __init__(self):
+        self.peak = rss_bytes()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            time.sleep(0.002)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def make_client(mode, provider, url):
+    """legacy 模式下请求体按改动前的实现构造 (json= 整体序列化 base64 字符串)"""
+    from gvs.ai import AIClient
+
+    class LegacyClient(AIClient):
+        def _call_zhipu(self, prompt, images_base64):
+            url = f"{self.api_base}/chat/completions"
+            headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+            content = [{"type": "text", "text": prompt}]
+            for img in images_base64:
+                content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}"}})
+            data = {"model": self.model, "messages": [{"role": "user", "content": content}], "temperature": 0.05}
+            resp = self.session.post(url, json=data, headers=headers, timeout=self.timeout)
+            self._raise_for_status(resp, "HTTP")
+            body = resp.json()
+            return body["choices"][0]["message"]["content"].strip(), (None, None)
+
+        def _call_gemini_rest(self, prompt, images_base64):
+            url = f"{self.api_base}/models/{self.model}:generateContent?key={self.api_key}"
+            parts = [{"text": prompt}]
+            for img in images_base64:
+                parts.append({"inline_data": {"mime_type": "image/jpeg", "data": img}})
+            data = {"contents": [{"parts": parts}], "generationConfig": {"temperature": 0.05}}
+            resp = self.session.post(url, json=data, headers={"Content-Type": "application/json"}, timeout=self.timeout)
+            self._raise_for_status(resp, "HTTP")
+            body = resp.json()
+            return body["candidates"][0]["content"]["parts"][0]["text"].strip(), (None, None)
+
+    cls = LegacyClient if mode == "legacy" else AIClient
+    return cls(provider, "bench-key", "mock-model", lambda s: None, api_base=url, max_retries=0, timeout=(10, 120))
+
+
+def send_batch(mode, client, frames):
+    from gvs.media import encode_image_b64, encode_image_jpeg
+    encode = encode_image_b64 if mode == "legacy" else encode_image_jpeg
+    spans = [{"start": i, "end": i + 1, "image": encode(img)} for i, img in enumerate(frames)]
+    payload = sum(len(sp["image"]) for sp in spans)
+    if client.chat_smart_batch(spans) is None:
+        raise RuntimeError("request failed")
+    return payload
+
+
+def child(args):
+    """子进程：生成帧 (视为解码器输出，不计入)，预热连接后测量一个批次"""
+    import tracemalloc
+    from PIL import Image
+
+    frames = [Image.frombytes("RGB", (args.width, args.height), os.urandom(args.width * args.height * 3))
+              for _ in range(args.frames)]
+    client = make_client(args.child, args.provider, args.url)
+    send_batch(args.child, client, frames[:1])
+
+    base = rss_bytes()
+    with RssSampler() as sampler:
+        payload = send_batch(args.child, client, frames)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    send_batch(args.child, client, frames)
+    _, traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    client.close()
+    print(json.dumps({"rss_mb": (sampler.peak - base) / 2**20, "traced_mb": traced / 2**20,
+                      "payload_mb": payload / 2**20}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=20, help="每批帧数")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--provider", type=int, default=0, choices=[0, 1], help="0=智谱接口格式 1=Gemini 接口格式")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    from mock_server import MockState, start_server
+    server, url = start_server(MockState(latency=0, per_image=0))
+    results = {}
+    try:
+        for mode in MODES:
+            cmd = [sys.executable, os.path.abspath(__file__), "--child", mode, "--url", url,
+                   "--frames", str(args.frames), "--width", str(args.width), "--height", str(args.height),
+                   "--provider", str(args.provider)]
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            results[mode] = json.loads(out.strip().splitlines()[-1])
+            r = results[mode]
+            print(f"{mode:>6}: 批次图片 {r['payload_mb']:.1f} MB, 峰值 RSS +{r['rss_mb']:.1f} MB, "
+                  f"Python 分配峰值 {r['traced_mb']:.1f} MB")
+    finally:
+        server.shutdown()
+    if results["stream"]["traced_mb"]:
+        print(f"stream 相对 legacy: RSS {results['legacy']['rss_mb'] / max(results['stream']['rss_mb'], 0.1):.1f}x, "
+              f"分配 {results['legacy']['traced_mb'] / results['stream']['traced_mb']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
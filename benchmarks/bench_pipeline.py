@@ -0,0 +1,221 @@
+"""
+完整流程基准测试：ffmpeg drawtext 生成已知字幕时间轴的合成视频，对本地模拟 AI 服务跑 SubtitleJob
+
+输出每个场景的 帧/s、上传字节数、请求数 (含 429)、总耗时，以及与真实时间轴对比的识别率和起止时间误差。
+--save-baseline 把结果写入 benchmarks/baselines.json；之后每次运行都会与之对比，加 --check 时出现回退返回 1。
+
+用法:
+    python benchmarks/bench_pipeline.py                       # 全部场景
+    python benchmarks/bench_pipeline.py --scenario 480p-60s --latency 0.2 --rate-429 0.1
+    python benchmarks/bench_pipeline.py --set mosaic=true --set workers=4 --check
+    python benchmarks/bench_pipeline.py --save-baseline
+
+部分 ffmpeg 构建的 drawtext 找不到默认字体，可用 --fontfile 指定 .ttf 文件。
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gvs.config import DEFAULT_OPTIONS
+from gvs.job import SubtitleJob
+from mock_server import MockState, start_server
+
+WORK_DIR = os.path.join(ROOT, "benchmarks", ".work")
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baselines.json")
+
+# 名称: (宽, 高, 秒数)
+SCENARIOS = {
+    "480p-60s": (854, 480, 60),
+    "1080p-60s": (1920, 1080, 60),
+    "720p-300s": (1280, 720, 300),
+}
+FPS = 25
+WORDS = ["hello", "world", "subtitle", "benchmark", "video", "frame", "timing", "mock", "sample", "line"]
+
+# 回退判定：耗时/上传量增加超过该比例，或识别率下降、误差增加超过阈值
+TOLERANCE = {"wall_s": 0.15, "bytes_uploaded": 0.05, "recall": 0.0, "mae_ms": 20.0}
+
+
+def make_cues(seconds, seed):
+    """随机生成字幕时间轴 [(start, end, text)]，时间对齐到帧，偶尔插入较长的无字幕段"""
+    rnd = random.Random(seed)
+    cues, t, i = [], 1.0, 0
+    while True:
+        t += rnd.choice([rnd.uniform(0.3, 2.5)] * 4 + [rnd.uniform(5, 12)])
+        start = round(t * FPS) / FPS
+        end = round((start + rnd.uniform(1.2, 4.0)) * FPS) / FPS
+        if end >= seconds - 1: break
+        i += 1
+        cues.append((start, end, f"Line {i:03d} {rnd.choice(WORDS)} {rnd.choice(WORDS)}"))
+        t = end
+    return cues
+
+
+def make_video(path, width, height, seconds, cues, fontfile=None, background="color"):
+    """用 lavfi 背景 + 每条字幕一个 drawtext (enable 按时间开关) 生成 H.264 视频"""
+    if background == "testsrc2":
+        source = f"testsrc2=s={width}x{height}:r={FPS}:d={seconds}"
+    else:
+        source = f"color=c=0x203040:s={width}x{height}:r={FPS}:d={seconds}"
+    font = f"fontfile='{fontfile}':" if fontfile else ""
+    draws = [
+        f"drawtext={font}text='{text}':fontcolor=white:fontsize={max(16, height // 20)}:borderw=2:"
+        f"x=(w-text_w)/2:y=h*0.85:enable='gte(t,{start})*lt(t,{end})'"
+        for start, end, text in cues
+    ]
+    cmd = ['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', source, '-vf', ",".join(draws),
+           '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(FPS * 2), '-pix_fmt', 'yuv420p', path]
+    subprocess.run(cmd, check=True)
+
+
+def parse_srt(path):
+    cues = []
+    with open(path, encoding="utf-8") as f:
+        blocks = f.read().strip().split("\n\n")
+    for block in blocks:
+        lines = block.strip().splitlines()
+        if len(lines) < 3: continue
+        m = re.match(r"(\d+):(\d+):(\d+),(\d+) --> (\d+):(\d+):(\d+),(\d+)", lines[1])
+        if not m: continue
+        v = [int(x) for x in m.groups()]
+        cues.append((v[0] * 3600 + v[1] * 60 + v[2] + v[3] / 1000, v[4] * 3600 + v[5] * 60 + v[6] + v[7] / 1000,
+                     "\n".join(lines[2:])))
+    return cues
+
+
+def accuracy(truth, output):
+    """按文字匹配真实字幕，返回 (识别率, 起止时间平均绝对误差 ms, p90 误差 ms)"""
+    found = {text: (s, e) for s, e, text in output}
+    matched, errors = 0, []
+    for s, e, text in truth:
+        if text in found:
+            matched += 1
+            out_start, out_end = found[text]
+            errors += [abs(out_start - s) * 1000, abs(out_end - e) * 1000]
+    if not errors:
+        return 0.0, None, None
+    errors.sort()
+    return matched / len(truth), sum(errors) / len(errors), errors[int(len(errors) * 0.9)]
+
+
+def run_scenario(name, args, state, url, overrides):
+    width, height, seconds = SCENARIOS[name]
+    video = os.path.join(WORK_DIR, f"{name}.mp4")
+    cues = make_cues(seconds, seed=seconds * 1000 + height)
+    if not os.path.exists(video) or args.regenerate:
+        make_video(video, width, height, seconds, cues, args.fontfile, args.background)
+
+    out_dir = os.path.join(WORK_DIR, "output", name)
+    os.makedirs(out_dir, exist_ok=True)
+    for f in os.listdir(out_dir):
+        os.remove(os.path.join(out_dir, f))
+    log_path = os.path.join(WORK_DIR, f"{name}.log")
+
+    state.truth = cues
+    state.reset()
+    options = {**DEFAULT_OPTIONS, "api_base": url, "cache": False, "resume": False, **overrides}
+    with open(log_path, "w", encoding="utf-8") as log_file:
+        job = SubtitleJob(video, args.region, f"mock-key-{name}", args.model, args.provider, options,
+                          log=lambda s: log_file.write(s + "\n"), output_dir=out_dir)
+        started = time.perf_counter()
+        srt_path = job.run()
+        wall = time.perf_counter() - started
+
+    output = parse_srt(srt_path) if srt_path else []
+    recall, mae, p90 = accuracy(cues, output)
+    return {
+        "wall_s": round(wall, 2),
+        "frames": job.frame_count,
+        "frames_per_s": round(job.frame_count / wall, 1) if wall else 0,
+        "images_uploaded": state.stats()["images"],
+        "bytes_uploaded": state.stats()["bytes_uploaded"],
+        "requests": state.stats()["requests"],
+        "throttled": state.stats()["throttled"],
+        "recall": round(recall, 3),
+        "mae_ms": round(mae, 1) if mae is not None else None,
+        "p90_ms": round(p90, 1) if p90 is not None else None,
+    }
+
+
+def regressions(result, base):
+    """与基线对比，返回回退说明列表"""
+    problems = []
+    for key in ("wall_s", "bytes_uploaded"):
+        if base.get(key) and result[key] > base[key] * (1 + TOLERANCE[key]):
+            problems.append(f"{key} {base[key]} -> {result[key]}")
+    if result["recall"] < base.get("recall", 0) - TOLERANCE["recall"]:
+        problems.append(f"recall {base['recall']} -> {result['recall']}")
+    if base.get("mae_ms") is not None and (result["mae_ms"] is None or result["mae_ms"] > base["mae_ms"] + TOLERANCE["mae_ms"]):
+        problems.append(f"mae_ms {base['mae_ms']} -> {result['mae_ms']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="只运行指定场景，可重复")
+    parser.add_argument("--provider", type=int, default=0, choices=[0, 1], help="0=智谱接口格式 1=Gemini 接口格式")
+    parser.add_argument("--model", default="mock-model")
+    parser.add_argument("--region", type=int, default=1, help="裁切区域 0=全画面 1=底部 2=中部 3=顶部 4=自动")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟服务每个请求的基础延迟 (秒)")
+    parser.add_argument("--per-image", type=float, default=0.02, help="模拟服务每张图片额外延迟 (秒)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="模拟服务返回 429 的比例")
+    parser.add_argument("--background", choices=["color", "testsrc2"], default="color", help="合成视频背景")
+    parser.add_argument("--fontfile", help="drawtext 使用的字体文件")
+    parser.add_argument("--regenerate", action="store_true", help="重新生成合成视频")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="覆盖高级选项，可重复")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--check", action="store_true", help="相对基线出现回退时返回 1")
+    args = parser.parse_args()
+
+    overrides = {}
+    for text in args.overrides:
+        key, _, value = text.partition("=")
+        if key not in DEFAULT_OPTIONS:
+            parser.error(f"未知选项: {key}")
+        try:
+            overrides[key] = json.loads(value)
+        except json.JSONDecodeError:
+            overrides[key] = value
+
+    os.makedirs(WORK_DIR, exist_ok=True)
+    state = MockState(args.latency, args.per_image, args.rate_429)
+    server, url = start_server(state)
+
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    results, failed = {}, False
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            result = results[name] = run_scenario(name, args, state, url, overrides)
+            print(f"{name:<10} " + "  ".join(f"{k}={v}" for k, v in result.items()))
+            if name in baselines and not args.save_baseline:
+                problems = regressions(result, baselines[name])
+                failed = failed or bool(problems)
+                print(f"{'':<10} 基线对比: {'; '.join(problems) or 'OK'}")
+    finally:
+        server.shutdown()
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存: {BASELINE_FILE}")
+
+    return 1 if args.check and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+本地模拟 智谱 / Gemini 接口，用于不消耗额度的基准测试
+
+根据提示词中列出的每张图 (或拼图中每条字幕条) 的时间段，按已知字幕时间轴返回 "完美识别" 的结果；
+可配置响应延迟与 429 注入比例，以及每个 Key 的请求额度 (用尽后返回智谱 1113 / Gemini 按天配额错误)。
+返回 usage / usageMetadata 字段，token 数按请求体大小估算。
+
+单独运行:
+    python benchmarks/mock_server.py --port 8765 --latency 0.5 --rate-429 0.1
+然后设置高级选项 api_base=http://127.0.0.1:8765
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE_RE = re.compile(r"(?:Image|Strip #)\s*(\d+)[^:\n]*:\s*([\d.]+)s - ([\d.]+)s")
+
+
+def answer(prompt, truth):
+    """按提示词中的时间段与真实时间轴 [(start, end, text)] 生成识别结果"""
+    spans = [(float(s), float(e)) for _, s, e in RANGE_RE.findall(prompt)]
+    items = []
+    for start, end, text in truth:
+        # 字幕在采样点 (每个时间段的起点) 可见才能被 "看到"
+        hits = [(s, e) for s, e in spans if start <= s < end]
+        if hits:
+            items.append({"start": hits[0][0], "end": hits[-1][1], "text": text})
+    return json.dumps(items, ensure_ascii=False)
+
+
+class MockState:
+    def __init__(self, latency=0.5, per_image=0.02, rate_429=0.0, retry_after=1, seed=0, quota=0):
+        self.latency = latency
+        self.per_image = per_image
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.quota = quota # 每个 Key 的请求额度，0=不限
+        self.random = random.Random(seed)
+        self.truth = []
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.throttled = 0
+            self.bytes_in = 0
+            self.images = 0
+            self.by_key = {}
+
+    def stats(self):
+        with self.lock:
+            return {"requests": self.requests, "throttled": self.throttled,
+                    "bytes_uploaded": self.bytes_in, "images": self.images, "by_key": dict(self.by_key)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        zhipu = self.path.endswith("/chat/completions")
+        if zhipu:
+            key = self.headers.get("Authorization", "").replace("Bearer ", "")
+        else:
+            key = self.headers.get("x-goog-api-key") or self.path.partition("key=")[2].split("&")[0]
+        with state.lock:
+            state.requests += 1
+            state.bytes_in += len(body)
+            used = state.by_key[key] = state.by_key.get(key, 0) + 1
+            exhausted = bool(state.quota) and used > state.quota
+            throttle = not exhausted and state.random.random() < state.rate_429
+            if throttle:
+                state.throttled += 1
+        if exhausted:
+            if zhipu:
+                return self.reply(429, {"error": {"code": "1113", "message": "mock: 余额不足"}})
+            return self.reply(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "mock quota exceeded",
+                                              "details": [{"@type": "type.googleapis.com/google.rpc.QuotaFailure",
+                                                           "violations": [{"quotaId": "GenerateRequestsPerDayPerProjectPerModel-FreeTier"}]}]}})
+        if throttle:
+            return self.reply(429, {"error": {"message": "mock rate limit"}}, {"Retry-After": str(state.retry_after)})
+
+        data = json.loads(body)
+        if zhipu: # 智谱
+            content = data["messages"][0]["content"]
+            prompt = next(c["text"] for c in content if c["type"] == "text")
+            n_images = sum(1 for c in content if c["type"] == "image_url")
+        elif ":generateContent" in self.path: # Gemini
+            parts = data["contents"][0]["parts"]
+            prompt = next(p["text"] for p in parts if "text" in p)
+            n_images = sum(1 for p in parts if "inline_data" in p)
+        else:
+            return self.reply(404, {"error": {"message": f"unknown path {self.path}"}})
+        with state.lock:
+            state.images += n_images
+
+        time.sleep(state.latency + state.per_image * n_images)
+        text = answer(prompt, state.truth)
+        prompt_tokens, completion_tokens = len(body) // 4, len(text) // 2
+        if zhipu:
+            self.reply(200, {"choices": [{"message": {"content": text}}],
+                             "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                       "total_tokens": prompt_tokens + completion_tokens}})
+        else:
+            self.reply(200, {"candidates": [{"content": {"parts": [{"text": text}]}}],
+                             "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens,
+                                               "totalTokenCount": prompt_tokens + completion_tokens}})
+
+    def reply(self, status, obj, headers=None):
+        payload = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_server(state, host="127.0.0.1", port=0):
+    """后台线程启动模拟服务器，返回 (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="每个请求的基础延迟 (秒)")
+    parser.add_argument("--per-image", type=float, default=0.02, help="每张图片额外延迟 (秒)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的比例 (0~1)")
+    parser.add_argument("--quota", type=int, default=0, help="每个 Key 的请求额度，用尽后返回额度错误 (0=不限)")
+    parser.add_argument("--truth", help="真实时间轴 JSON 文件 [[start, end, text], ...]")
+    args = parser.parse_args()
+
+    state = MockState(args.latency, args.per_image, args.rate_429, quota=args.quota)
+    if args.truth:
+        with open(args.truth, encoding="utf-8") as f:
+            state.truth = [tuple(c) for c in json.load(f)]
+    server, url = start_server(state, port=args.port)
+    print(f"mock server: {url}  (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
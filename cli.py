@@ -0,0 +1,192 @@
+"""
+GVS 命令行版：无需图形界面，批量提取视频硬字幕
+
+用法:
+    python cli.py 视频1.mp4 视频2.mkv
+    python cli.py 视频目录/ --recursive --jobs 4 --provider gemini --model gemini-2.5-flash
+    python cli.py 视频目录/ --set workers=4 --set dedup=false
+
+API Key 依次取自 --key、环境变量 GVS_ZHIPU_KEY / GVS_GEMINI_KEY、config.json
+退出码: 0=全部成功, 1=部分视频失败, 2=参数错误或未找到视频, 130=被中断
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from gvs.config import (CONFIG_KEYS, DEFAULT_MODELS, DEFAULT_OPTIONS, ENV_KEYS, OUTPUT_DIR, PROVIDERS, load_config,
+                        options_from_config)
+from gvs.i18n import TRANS, tr, get_language, set_language
+from gvs.job import SubtitleJob
+
+VIDEO_EXTS = ('.mp4', '.mkv', '.avi', '.mov', '.flv', '.ts', '.m4v', '.webm', '.wmv')
+
+
+def collect_videos(paths, recursive=False):
+    """展开命令行中的文件与目录，返回去重后的视频列表"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for root, _, files in os.walk(path):
+                    videos += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(VIDEO_EXTS)]
+            else:
+                videos += [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(VIDEO_EXTS)]
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(tr("cli_skip_path").format(path), file=sys.stderr)
+    seen = set()
+    return [v for v in videos if not (os.path.abspath(v) in seen or seen.add(os.path.abspath(v)))]
+
+
+def output_subdirs(videos):
+    """
+    每个视频的输出子目录：镜像视频所在目录相对所有视频公共上级目录的路径，
+    不同目录下的同名视频 (S01/E01.mp4、S02/E01.mp4) 的字幕、日志与断点日志不会写到同一个文件
+    """
+    dirs = [os.path.dirname(os.path.abspath(v)) for v in videos]
+    try:
+        root = os.path.commonpath(dirs)
+    except ValueError:
+        # Windows 下位于不同盘符：以盘符作为第一级目录
+        return {v: os.path.join(os.path.splitdrive(d)[0].strip(":\\/"), os.path.splitdrive(d)[1].lstrip("\\/"))
+                for v, d in zip(videos, dirs)}
+    return {v: os.path.relpath(d, root) if d != root else "" for v, d in zip(videos, dirs)}
+
+
+def parse_option(text):
+    """解析 --set key=value，value 按 JSON 解析 (true/2/0.5)，失败则作为字符串"""
+    key, sep, value = text.partition("=")
+    if not sep or key not in DEFAULT_OPTIONS:
+        raise argparse.ArgumentTypeError(f"未知选项: {text} (可用: {', '.join(DEFAULT_OPTIONS)})")
+    try:
+        return key, json.loads(value)
+    except json.JSONDecodeError:
+        return key, value
+
+
+def run_one(video_path, job_args, subdir=""):
+    """
+    进程池工作函数：处理单个视频，日志写入独立文件，返回 (视频, SRT 路径, 日志路径, 耗时)
+    subdir 为输出目录与日志目录下的子目录 (见 output_subdirs)
+    """
+    set_language(job_args["lang"])
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    output_dir = os.path.join(job_args["output_dir"], subdir)
+    log_dir = os.path.join(job_args["log_dir"], subdir)
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{base_name}.log")
+    started = time.time()
+    srt_path = None
+
+    with open(log_path, "a", encoding="utf-8") as f:
+        def log(s):
+            f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {s}\n")
+            f.flush()
+
+        last_step = [-1]
+        def progress(cur, total):
+            # 每 10% 记录一次进度
+            pct = cur * 100 // total if total else 100
+            if pct // 10 != last_step[0]:
+                last_step[0] = pct // 10
+                log(f"progress {cur}/{total} ({pct}%)")
+
+        try:
+            job = SubtitleJob(video_path, job_args["region_idx"], job_args["api_key"], job_args["model"],
+                              job_args["provider_idx"], job_args["options"],
+                              log=log, progress=progress, output_dir=output_dir)
+            srt_path = job.run()
+        except Exception:
+            log(traceback.format_exc())
+
+    return video_path, srt_path, log_path, time.time() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="视频文件或目录")
+    parser.add_argument("-r", "--recursive", action="store_true", help="递归扫描子目录")
+    parser.add_argument("-j", "--jobs", type=int, default=min(4, os.cpu_count() or 1), help="同时处理的视频数 (进程数)")
+    parser.add_argument("--provider", choices=list(PROVIDERS), help="AI 服务 (默认取 config.json)")
+    parser.add_argument("--model", help="模型名称 (默认取 config.json)")
+    parser.add_argument("--key", help="API Key")
+    parser.add_argument("--region", type=int, choices=range(len(TRANS["en"]["regions"])), help="裁切区域 0=全画面 1=底部 2=中部 3=顶部 4=自动")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help="SRT 输出目录")
+    parser.add_argument("--log-dir", help="每个视频的日志目录 (默认: 输出目录/logs)")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_option, default=[],
+                        metavar="KEY=VALUE", help="覆盖高级选项，可重复")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    cfg_provider = int(cfg.get("provider_idx", 0))
+    provider_idx = PROVIDERS[args.provider] if args.provider else cfg_provider
+    model = args.model or (cfg.get("model") if provider_idx == cfg_provider else None) or DEFAULT_MODELS[provider_idx]
+    api_key = args.key or os.environ.get(ENV_KEYS[provider_idx]) or cfg.get(CONFIG_KEYS[provider_idx], "")
+    if not api_key:
+        print(tr("msg_no_key").format(tr("providers")[provider_idx]), file=sys.stderr)
+        return 2
+
+    videos = collect_videos(args.paths, args.recursive)
+    if not videos:
+        print(tr("msg_no_video"), file=sys.stderr)
+        return 2
+
+    log_dir = args.log_dir or os.path.join(args.output_dir, "logs")
+    os.makedirs(args.output_dir, exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
+
+    options = options_from_config(cfg)
+    options.update(dict(args.overrides))
+    job_args = {
+        "region_idx": args.region if args.region is not None else int(cfg.get("region_idx", 1)),
+        "provider_idx": provider_idx,
+        "model": model,
+        "api_key": api_key,
+        "options": options,
+        "output_dir": args.output_dir,
+        "log_dir": log_dir,
+        "lang": get_language(),
+    }
+
+    print(tr("service_info").format(tr("providers")[provider_idx], model))
+    print(tr("cli_start").format(len(videos), args.jobs, log_dir))
+
+    ok, failed = [], []
+    pool = ProcessPoolExecutor(max_workers=max(1, args.jobs))
+    try:
+        subdirs = output_subdirs(videos)
+        futures = {pool.submit(run_one, v, job_args, subdirs[v]): v for v in videos}
+        for fut in as_completed(futures):
+            try:
+                video, srt_path, log_path, elapsed = fut.result()
+            except Exception as e:
+                # 工作进程异常退出 (被 OOM 终止、ffmpeg / Pillow 崩溃) 时进程池失效，尚未完成的视频都记为失败
+                failed.append(futures[fut])
+                print(tr("cli_crashed").format(futures[fut], repr(e)))
+                continue
+            if srt_path:
+                ok.append(video)
+                print(tr("cli_ok").format(video, srt_path, elapsed))
+            else:
+                failed.append(video)
+                print(tr("cli_fail").format(video, log_path))
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        print(tr("cli_interrupted"), file=sys.stderr)
+        return 130
+    pool.shutdown()
+
+    print(tr("cli_done").format(len(ok), len(failed)))
+    for video in failed:
+        print(tr("cli_failed_item").format(video))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
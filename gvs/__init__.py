@@ -0,0 +1,35 @@
+"""
+GVS 核心包：截帧、裁切、去重、AI 识别、拼接与 SRT 输出，不依赖 PySide6
+
+导入本包及其子模块没有副作用 (不创建目录、不检测语言)，
+PIL / requests 等较重的依赖在首次使用时才加载。常用名称可直接从包中取得：
+
+    from gvs import SubtitleJob, AIClient, ms_to_srt_time
+"""
+import importlib
+
+_EXPORTS = {
+    "SubtitleJob": "gvs.job",
+    "AIClient": "gvs.ai",
+    "ResponseCache": "gvs.cache",
+    "BatchJournal": "gvs.journal",
+    "ms_to_srt_time": "gvs.srt",
+    "tr": "gvs.i18n",
+    "set_language": "gvs.i18n",
+    "load_config": "gvs.config",
+    "save_config": "gvs.config",
+    "options_from_config": "gvs.config",
+    "DEFAULT_OPTIONS": "gvs.config",
+    "OUTPUT_DIR": "gvs.config",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'gvs' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
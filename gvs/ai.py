@@ -0,0 +1,439 @@
+"""智谱 / Gemini 多模态接口调用与结果解析 (requests 在首次请求时导入)"""
+import ast
+import json
+import time
+import threading
+
+from .cache import ResponseCache
+from .config import redact_text
+from .debuglog import ERROR, INFO, PAYLOAD, log_debug
+from .i18n import tr
+from .metrics import Metrics
+from .payload import StreamingJSONBody
+from .ratelimit import backoff_delay, get_limiter
+
+def shift_items(items, delta):
+    """平移 AI 结果中的 start/end 时间，无法转为数字的字段保持原样"""
+    shifted = []
+    for item in items:
+        if not isinstance(item, dict): continue
+        item = dict(item)
+        for k in ("start", "end"):
+            try:
+                item[k] = float(item[k]) + delta
+            except (KeyError, TypeError, ValueError):
+                pass
+        shifted.append(item)
+    return shifted
+
+
+def salvage_items(text):
+    """
+    从截断或夹杂说明文字的回复中逐个恢复完整的 {start, end, text} 对象
+    先按 JSON 解析，失败再按 Python 字面量 (单引号) 解析；不完整的对象丢弃
+    """
+    decoder = json.JSONDecoder()
+    items = []
+    pos = text.find("{")
+    while pos != -1:
+        obj, end = None, pos + 1
+        try:
+            obj, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            close = text.find("}", pos)
+            if close != -1:
+                try:
+                    obj = ast.literal_eval(text[pos:close + 1])
+                    end = close + 1
+                except Exception:
+                    obj = None
+        if isinstance(obj, dict) and "text" in obj and "start" in obj and "end" in obj:
+            items.append(obj)
+        else:
+            end = pos + 1
+        pos = text.find("{", end)
+    return items
+
+def item_start(item):
+    """条目的开始时间 (排序用)，无法解析时视为 0"""
+    try:
+        return float(item.get("start", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def uncovered_spans(spans, items):
+    """返回没有任何识别结果覆盖的帧 (时间段与所有条目都不相交)"""
+    ranges = []
+    for item in items:
+        try:
+            ranges.append((float(item["start"]), float(item["end"])))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return [sp for sp in spans if not any(s < sp["end"] and e > sp["start"] for s, e in ranges)]
+
+
+# 可重试的 HTTP 状态码，其余 4xx (如 Key 无效) 直接放弃
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# 智谱表示余额不足 / 当日或套餐额度用尽的错误码 (重试无意义，需换 Key)
+ZHIPU_QUOTA_CODES = {"1113", "1304", "1308", "1309", "1310"}
+
+
+class APIError(Exception):
+    """服务端返回的非 200 响应，携带状态码、错误码 (智谱 code / Gemini status) 与 Retry-After (秒)"""
+    def __init__(self, status, message, retry_after=None, code=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.code = code
+
+    @property
+    def throttled(self):
+        return self.status == 429
+
+    @property
+    def retryable(self):
+        return self.status in RETRYABLE_STATUS
+
+    @property
+    def too_large(self):
+        """请求体过大 (413，或 Gemini 以 400 返回的 payload size 超限)，拆小批次后可以成功"""
+        if self.status == 413: return True
+        msg = str(self).lower()
+        return self.status == 400 and ("payload size" in msg or "too large" in msg or "exceeds the limit" in msg)
+
+    @property
+    def rejected(self):
+        """请求本身被拒绝 (模型名错误、参数不合法等 4xx)：重试和拆分批次都无济于事"""
+        return not self.retryable and not self.quota_exhausted and not self.too_large
+
+    @property
+    def quota_exhausted(self):
+        """Key 无效或额度用尽：应停用该 Key 而不是等待重试 (按分钟的限流仍视为普通 429)"""
+        if self.status in (401, 403): return True
+        # Gemini 对无效 Key 返回 400 (reason API_KEY_INVALID, "API key not valid")
+        if self.status == 400 and "API_KEY_INVALID" in str(self): return True
+        if str(self.code) in ZHIPU_QUOTA_CODES: return True
+        # Gemini: RESOURCE_EXHAUSTED 且配额为按天计算
+        return self.status == 429 and "PerDay" in str(self)
+
+
+def is_timeout(e):
+    """连接/读取超时或 408、413 等提示批次过大的错误"""
+    if isinstance(e, APIError):
+        return e.status in (408, 504) or e.too_large
+    import requests
+    return isinstance(e, requests.exceptions.Timeout)
+
+
+def parse_retry_after(resp):
+    """读取 Retry-After 头 (秒数或 HTTP 日期)，以及 Gemini 错误详情中的 RetryInfo.retryDelay"""
+    value = resp.headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            from email.utils import parsedate_to_datetime
+            from datetime import datetime, timezone
+            try:
+                return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    try:
+        for detail in resp.json()["error"].get("details", []):
+            if detail.get("@type", "").endswith("RetryInfo"):
+                return float(detail["retryDelay"].rstrip("s"))
+    except Exception:
+        pass
+    return None
+
+
+ZHIPU_API_BASE = "https://open.bigmodel.cn/api/paas/v4"
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+
+class AIClient:
+    """
+    pool_size: 连接池大小，应与并发请求数一致
+    timeout: (连接超时, 读取超时) 秒
+    api_base: 覆盖服务地址 (例如指向本地模拟服务器)
+    rpm / max_retries: 每分钟请求上限 (0=不限，被限流后自动收紧) 与失败重试次数
+    mosaic: 拼图模式参数 {"rows", "width", "max_bytes"}，None 为每帧单独一张图
+    metrics: 记录请求耗时、重试、缓存命中与 token 用量的 Metrics
+    quota_cooldown: Key 无效或额度用尽后停用的秒数
+    同一服务商 + Key 的客户端共享一个 RateLimiter
+    """
+    def __init__(self, provider_idx, api_key, model, log, cache=None,
+                 pool_size=2, timeout=(10, 60), api_base=None, rpm=0, max_retries=4,
+                 mosaic=None, metrics=None, quota_cooldown=3600):
+        self.provider_idx = provider_idx # 0=智谱, 1=Gemini
+        self.api_key = api_key
+        self.model = model
+        self.log = log # 日志回调 log(str)
+        self.cache = cache
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = tuple(timeout)
+        self.api_base = (api_base or (ZHIPU_API_BASE if provider_idx == 0 else GEMINI_API_BASE)).rstrip("/")
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.max_retries = max(0, int(max_retries))
+        self.limiter = get_limiter(provider_idx, api_key, self.pool_size, rpm)
+        self.mosaic = mosaic
+        self.metrics = metrics or Metrics()
+        self.quota_cooldown = float(quota_cooldown)
+        # 日志与字幕来源中使用的名称，Key 只保留末 4 位
+        self.label = f"{('zhipu', 'gemini')[provider_idx]}:{model}:…{api_key[-4:]}"
+
+    @property
+    def session(self):
+        """复用 TCP/TLS 连接的会话 (keep-alive)，首次请求时创建"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.verify = False
+                    self._session = session
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def describe(self):
+        return f"{self.label} {self.limiter.describe()}"
+
+    def build_prompt(self, spans, offset=0):
+        """生成提示词，offset 用于把时间段平移 (缓存键使用相对批次起点的时间)"""
+        ranges = "\n".join(f"Image {i+1}: {sp['start'] - offset}s - {sp['end'] - offset}s" for i, sp in enumerate(spans))
+        return (
+            f"I provide {len(spans)} chronological video frames.\n"
+            "Each image shows the screen during the time range listed below (start inclusive, end exclusive, in seconds):\n"
+            f"{ranges}\n"
+            "Your task:\n"
+            "1. Identify hard subtitles in the images.\n"
+            "2. MERGE continuous identical subtitles into a single entry.\n"
+            "3. Use the start of the first image and the end of the last image showing the subtitle as its start/end.\n"
+            "4. Return a JSON list. Format: [{\"start\": 10, \"end\": 12, \"text\": \"Content\"}]\n"
+            "5. Use DOUBLE QUOTES for keys and strings.\n"
+            "6. If no subtitle, do not include in list.\n"
+            "7. Output ONLY the JSON string."
+        )
+
+    def build_mosaic_prompt(self, spans, sheets):
+        """拼图模式的提示词：说明每张图由若干带编号标签的字幕条纵向拼接而成"""
+        lines = []
+        for n, sheet in enumerate(sheets):
+            for k, (y0, y1) in enumerate(sheet["rows"]):
+                sp = spans[sheet["first"] + k]
+                lines.append(f"Strip #{sheet['first'] + k + 1} (image {n+1}, y={y0}-{y1}px): {sp['start']}s - {sp['end']}s")
+        return (
+            f"I provide {len(sheets)} images. Each image is a vertical stack of subtitle strips cropped from "
+            f"{len(spans)} chronological video frames, top to bottom.\n"
+            "Every strip is preceded by a white label bar with its number (#1, #2, ...); the label is NOT a subtitle.\n"
+            "Each strip shows the screen during the time range listed below (start inclusive, end exclusive, in seconds):\n"
+            + "\n".join(lines) + "\n"
+            "Your task:\n"
+            "1. Identify hard subtitles in each strip separately (never join text across strips).\n"
+            "2. MERGE continuous identical subtitles into a single entry.\n"
+            "3. Use the start of the first strip and the end of the last strip showing the subtitle as its start/end.\n"
+            "4. Return a JSON list. Format: [{\"start\": 10, \"end\": 12, \"text\": \"Content\"}]\n"
+            "5. Use DOUBLE QUOTES for keys and strings.\n"
+            "6. If no subtitle, do not include in list.\n"
+            "7. Output ONLY the JSON string."
+        )
+
+    def prepare_request(self, spans):
+        """返回实际发送的 (提示词, 图片列表)；拼图模式下把字幕条拼成少量长图"""
+        if not self.mosaic:
+            return self.build_prompt(spans), [sp["image"] for sp in spans]
+        from .mosaic import pack_mosaic
+        labels = [f"#{i+1}" for i in range(len(spans))]
+        sheets = pack_mosaic([sp["image"] for sp in spans], labels, **self.mosaic)
+        return self.build_mosaic_prompt(spans, sheets), [s["image"] for s in sheets]
+
+    def chat_smart_batch(self, spans, split_on_timeout=False, salvage=True):
+        """
+        spans: 按时间顺序的帧列表 [{"start": 秒, "end": 秒, "image": JPEG 字节}]
+        每张图覆盖 [start, end) 时间段 (去重后相同画面合并为一张)
+        返回字幕列表；请求或解析失败返回 None (不写入缓存与断点日志)
+        请求被拒绝 (APIError.rejected，如模型名错误) 时直接抛出 APIError，调用方不应再拆分重试
+        split_on_timeout: 多帧批次超时或请求体过大时不再原样重试，直接返回 None 交由调用方拆分
+        salvage: 回复不是合法 JSON 时恢复其中完整的条目，只对未覆盖的帧再请求一次
+        """
+        start_sec = spans[0]["start"]
+
+        # 缓存键与结果都使用相对批次起点的时间，不同剧集相同的片头片尾也能命中
+        cache_key = None
+        if self.cache:
+            key_prompt = self.build_prompt(spans, start_sec)
+            if self.mosaic:
+                key_prompt = f"mosaic={sorted(self.mosaic.items())}\n{key_prompt}"
+            cache_key = ResponseCache.make_key(self.provider_idx, self.model, key_prompt, [sp["image"] for sp in spans])
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.metrics.inc("cache_hits")
+                return shift_items(json.loads(cached), start_sec)
+            self.metrics.inc("cache_misses")
+
+        with self.metrics.timer("pack"):
+            prompt_text, images = self.prepare_request(spans)
+
+        attempts = self.max_retries + 1
+        for i in range(attempts):
+            if self.limiter.disabled: break
+            with self.metrics.timer("rate_limit_wait"):
+                ticket = self.limiter.acquire()
+            self.metrics.inc("requests")
+            try:
+                resp_text, usage = "", (None, None)
+                with self.metrics.timer("http"):
+                    if self.provider_idx == 0: # 智谱
+                        resp_text, usage = self._call_zhipu(prompt_text, images)
+                    elif self.provider_idx == 1: # Gemini
+                        resp_text, usage = self._call_gemini_rest(prompt_text, images)
+            except Exception as e:
+                err_str = redact_text(e, (self.api_key,)) # requests 的连接错误信息中带有完整 URL
+                log_debug(f"API Error: {err_str}", ERROR)
+                self.log(tr("api_fail").format(i+1, attempts, err_str))
+
+                throttled = isinstance(e, APIError) and e.throttled
+                retry_after = e.retry_after if isinstance(e, APIError) else None
+                self.limiter.release(ticket, ok=False, throttled=throttled, retry_after=retry_after)
+                self.metrics.inc("throttled" if throttled else "request_errors")
+                if isinstance(e, APIError) and e.quota_exhausted:
+                    # 额度用尽：停用该 Key (同一进程内共享)，由调用方换用其它 Key
+                    self.limiter.disable(self.quota_cooldown)
+                    self.metrics.inc("keys_disabled")
+                    self.log(tr("key_disabled").format(self.label, self.quota_cooldown / 60))
+                    break
+                if isinstance(e, APIError) and e.rejected:
+                    raise
+                if isinstance(e, APIError) and not e.retryable:
+                    break
+                if split_on_timeout and len(spans) > 1 and is_timeout(e):
+                    break
+                if i + 1 >= attempts:
+                    break
+
+                self.metrics.inc("retries")
+                delay = retry_after or backoff_delay(i, base=2.0 if throttled else 1.0)
+                if throttled:
+                    self.log(tr("rate_limit").format(delay, self.limiter.describe()))
+                    self.limiter.pause(delay)
+                else:
+                    self.log(tr("common_error").format(delay))
+                    time.sleep(delay)
+                continue
+
+            self.limiter.release(ticket, ok=True)
+            self.metrics.add_usage(start_sec, spans[-1]["end"], *usage)
+            log_debug(f"Batch {start_sec}s - {len(spans)} frames, {len(images)} images, tokens={usage}, {len(resp_text)} chars", INFO)
+            log_debug(f"Batch {start_sec}s - Response:\n{resp_text}", PAYLOAD)
+            
+            clean_json = resp_text.replace("```json", "").replace("```", "").strip()
+            
+            parse_started = time.perf_counter()
+            try:
+                data = json.loads(clean_json)
+            except json.JSONDecodeError:
+                try:
+                    data = ast.literal_eval(clean_json)
+                except Exception as e:
+                    log_debug(f"JSON Parse Error: {e}\nRaw content: {clean_json}", ERROR)
+                    self.metrics.inc("parse_errors")
+                    self.metrics.observe("parse", time.perf_counter() - parse_started)
+                    data = self.salvage_batch(spans, clean_json, split_on_timeout) if salvage else None
+                    if data is None:
+                        return None
+                    parse_started = time.perf_counter()
+            self.metrics.observe("parse", time.perf_counter() - parse_started)
+            
+            if not isinstance(data, list):
+                data = []
+            if self.cache:
+                self.cache.put(cache_key, json.dumps(shift_items(data, -start_sec), ensure_ascii=False))
+            return data
+        return None
+
+    def salvage_batch(self, spans, text, split_on_timeout=False):
+        """
+        恢复不完整回复中的条目，未被覆盖的帧 (截断丢失或本就无字幕) 单独再请求一次
+        什么都没恢复时返回 None，由调用方按失败处理
+        """
+        items = salvage_items(text)
+        if not items: return None
+        missing = uncovered_spans(spans, items)
+        self.log(tr("salvage_info").format(len(items), len(missing)))
+        self.metrics.inc("salvaged_batches")
+        if missing:
+            extra = self.chat_smart_batch(missing, split_on_timeout, salvage=False)
+            if extra is None: return None # 缺失部分仍失败：不缓存残缺结果，整批按失败处理
+            items += extra
+        return sorted(items, key=item_start)
+
+    def _raise_for_status(self, resp, label):
+        if resp.status_code == 200: return
+        code = None
+        try:
+            error = resp.json()["error"]
+            err_msg = error["message"]
+            code = error.get("code") if self.provider_idx == 0 else error.get("status")
+            if "PerDay" in resp.text and "PerDay" not in err_msg:
+                err_msg += " (PerDay quota)"
+            if "API_KEY_INVALID" in resp.text and "API_KEY_INVALID" not in err_msg:
+                err_msg += " (API_KEY_INVALID)" # 原因只在 details 中，保留下来用于判断 Key 无效
+        except:
+            err_msg = resp.text
+        raise APIError(resp.status_code, f"{label} {resp.status_code}: {err_msg}", parse_retry_after(resp), code)
+
+    def _call_zhipu(self, prompt, images):
+        url = f"{self.api_base}/chat/completions"
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        def build(refs):
+            content = [{"type": "text", "text": prompt}]
+            for ref in refs:
+                content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{ref}"}})
+            return {"model": self.model, "messages": [{"role": "user", "content": content}], "temperature": 0.05}
+        
+        # 请求体边编码边发送，不在内存中拼出完整的 base64 JSON
+        resp = self.session.post(url, data=StreamingJSONBody(build, images), headers=headers, timeout=self.timeout)
+        
+        self._raise_for_status(resp, "HTTP")
+        
+        body = resp.json()
+        usage = body.get("usage") or {}
+        return body["choices"][0]["message"]["content"].strip(), (usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+    def _call_gemini_rest(self, prompt, images):
+        url = f"{self.api_base}/models/{self.model}:generateContent"
+        # Key 放在请求头而不是 URL 中，连接错误信息里不会带出 Key
+        headers = {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+        def build(refs):
+            parts = [{"text": prompt}]
+            for ref in refs:
+                parts.append({"inline_data": {"mime_type": "image/jpeg", "data": ref}})
+            return {
+                "contents": [{"parts": parts}], 
+                "generationConfig": {"temperature": 0.05}
+            }
+        
+        resp = self.session.post(url, data=StreamingJSONBody(build, images), headers=headers, timeout=self.timeout)
+        
+        self._raise_for_status(resp, "Gemini Error")
+            
+        try:
+            body = resp.json()
+            usage = body.get("usageMetadata") or {}
+            return (body["candidates"][0]["content"]["parts"][0]["text"].strip(),
+                    (usage.get("promptTokenCount"), usage.get("candidatesTokenCount")))
+        except:
+            try:
+                feedback = resp.json()["promptFeedback"]
+                raise Exception(f"Safety Block: {feedback}")
+            except:
+                raise Exception(f"Invalid Structure: {resp.text[:100]}...")
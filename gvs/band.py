@@ -0,0 +1,101 @@
+"""
+字幕带自动检测 ("自动" 区域)：均匀抽取若干帧，统计每一行的文字型边缘密度，
+找出在多帧中反复出现文字的水平带，加边距后作为裁切范围；同样的统计也用于本地判断帧中是否有字幕
+逐行统计由 PIL 的缩放/查表完成 (C 实现)，不依赖 NumPy
+"""
+import subprocess
+
+from .media import _hidden_startupinfo, edge_map
+
+REGION_AUTO = 4 # 区域下拉框中 "自动" 的索引
+SAMPLE_WIDTH = 640
+
+
+def sample_gray_frame(video_path, time_sec, width=SAMPLE_WIDTH):
+    """在 time_sec 处截取一帧，缩放到指定宽度的灰度图，失败返回 None"""
+    from PIL import Image
+    cmd = ['ffmpeg', '-v', 'error', '-ss', str(time_sec), '-i', video_path, '-frames:v', '1',
+           '-vf', f'scale={width}:-2,format=gray', '-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1']
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, startupinfo=_hidden_startupinfo(), check=False)
+    except OSError:
+        return None
+    data = result.stdout
+    if result.returncode != 0 or not data or len(data) % width:
+        return None
+    return Image.frombytes('L', (width, len(data) // width), data)
+
+
+def row_edge_density(gray, edge_threshold=48):
+    """每一行中水平梯度超过阈值的像素占比 (文字笔画左右边缘密集)"""
+    from PIL import Image
+    w, h = gray.size
+    edges = edge_map(gray, edge_threshold)
+    # 缩放到 1 像素宽 (BOX 取均值) 即得到逐行平均值
+    return [v / 255 for v in edges.resize((1, h), Image.Resampling.BOX).getdata()]
+
+
+def has_text(gray, threshold=0.15, edge_threshold=32, cell=(32, 3)):
+    """
+    本地预筛：裁切区域 (宽 640 的灰度缩略图) 中是否可能有字幕
+    按 32x3 像素的小格统计水平梯度边缘占比，任一格达到 threshold 即认为有字
+    (文字笔画密集，短句也能命中；宁可误判为有字，也不漏掉字幕)
+    """
+    if gray is None: return True
+    from PIL import Image
+    w, h = gray.size
+    edges = edge_map(gray, edge_threshold)
+    cells = edges.resize((max(1, w // cell[0]), max(1, h // cell[1])), Image.Resampling.BOX)
+    hist = cells.histogram()
+    densest = max(v for v in range(256) if hist[v])
+    return densest >= threshold * 255
+
+
+def find_band(frames, min_density=0.05, max_presence=0.95, padding=0.3, min_height=0.08):
+    """
+    frames: 同尺寸灰度图列表，返回 (上边界, 下边界) 占画面高度的比例，未找到返回 None
+    某行在多少比例的帧中呈现文字边缘即为该行得分；几乎每帧都有的行 (台标、固定图案) 不计
+    取得分连续且总分最高的一段 (略偏向画面下方)，上下各加 padding 倍带高的边距
+    """
+    if not frames: return None
+    h = frames[0].size[1]
+    counts = [0] * h
+    for gray in frames:
+        for y, d in enumerate(row_edge_density(gray)):
+            if d >= min_density:
+                counts[y] += 1
+    presence = [c / len(frames) for c in counts]
+    scores = [p if p <= max_presence else 0.0 for p in presence]
+    peak = max(scores)
+    if peak < 0.1: return None
+
+    # 高于峰值一半的行组成候选段，间隔不超过 2% 高度的段合并 (两行字幕之间的行距)
+    gap = max(1, int(h * 0.02))
+    runs = []
+    for y, s in enumerate(scores):
+        if s < peak / 2: continue
+        if runs and y - runs[-1][1] <= gap:
+            runs[-1][1] = y
+        else:
+            runs.append([y, y])
+    y0, y1 = max(runs, key=lambda r: sum(scores[r[0]:r[1] + 1]) * (1 + 0.25 * (r[0] + r[1]) / (2 * h)))
+
+    pad = max(int(h * 0.02), int((y1 - y0 + 1) * padding))
+    y0, y1 = max(0, y0 - pad), min(h, y1 + 1 + pad)
+    if y1 - y0 < h * min_height:
+        extra = (h * min_height - (y1 - y0)) / 2
+        y0, y1 = max(0, int(y0 - extra)), min(h, int(y1 + extra + 0.5))
+    return round(y0 / h, 4), round(y1 / h, 4)
+
+
+def detect_subtitle_band(video_path, duration, samples=30):
+    """均匀抽取 samples 帧 (避开片头片尾各 5%) 检测字幕带，返回 (上, 下) 比例或 None"""
+    if duration <= 0: return None
+    lo, hi = duration * 0.05, duration * 0.95
+    step = (hi - lo) / max(1, samples - 1)
+    frames = []
+    for i in range(samples):
+        gray = sample_gray_frame(video_path, round(lo + i * step, 3))
+        if gray is not None and (not frames or gray.size == frames[0].size):
+            frames.append(gray)
+    return find_band(frames)
@@ -0,0 +1,48 @@
+"""按请求体大小、估算 token 与实际耗时自适应调整批次大小"""
+import math
+import threading
+
+from .payload import b64_len
+
+
+def estimate_image_tokens(w, h, tile=768, tokens_per_tile=258):
+    """按 768x768 分块估算单张图片的输入 token (与 Gemini 计费方式一致，其它模型作近似)"""
+    return max(1, math.ceil(w / tile)) * max(1, math.ceil(h / tile)) * tokens_per_tile
+
+
+class BatchSizer:
+    """
+    批次在帧数、base64 字节数、估算 token 任一达到上限时截断
+    帧数上限随反馈调整：耗时远低于目标时 +2，超过目标时缩小 1/4，失败/超时时减半
+    """
+    def __init__(self, initial=20, min_frames=2, max_frames=40,
+                 max_bytes=8 * 1024 * 1024, max_tokens=32000, target_latency=30.0):
+        self.min_frames = max(1, int(min_frames))
+        self.max_frames = max(self.min_frames, int(max_frames))
+        self.size = min(self.max_frames, max(self.min_frames, int(initial)))
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.target_latency = target_latency
+        self.lock = threading.Lock()
+
+    def is_full(self, spans, next_span=None):
+        """当前批次已满，或再加入 next_span 会超出字节/token 预算"""
+        if not spans: return False
+        if len(spans) >= self.size: return True
+        extra = [next_span] if next_span else []
+        if self.max_bytes and sum(b64_len(len(sp["image"])) for sp in spans + extra) > self.max_bytes:
+            return True
+        if self.max_tokens and sum(sp.get("tokens", 0) for sp in spans + extra) > self.max_tokens:
+            return True
+        return False
+
+    def record(self, frames, latency, ok):
+        """一个批次结束后反馈结果，返回调整后的帧数上限"""
+        with self.lock:
+            if not ok:
+                self.size = max(self.min_frames, min(self.size, frames) // 2)
+            elif latency > self.target_latency:
+                self.size = max(self.min_frames, int(self.size * 0.75))
+            elif latency < self.target_latency / 2 and frames >= self.size:
+                self.size = min(self.max_frames, self.size + 2)
+            return self.size
@@ -0,0 +1,85 @@
+"""AI 批次响应的本地缓存"""
+import os
+import time
+import threading
+
+from .payload import b64_chunks
+
+class ResponseCache:
+    """
+    AI 批次响应的持久化缓存 (SQLite)
+    键为 服务商+模型+提示词+图片字节 的 sha256，超出 max_bytes 后按最近使用时间 (LRU) 淘汰
+    """
+    def __init__(self, path, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        import sqlite3
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        # 缓存总大小只在打开时统计一次，之后随写入与淘汰增减 (其它进程的写入在超限时重新统计)
+        self.total = self._total()
+
+    @staticmethod
+    def make_key(provider_idx, model, prompt, images):
+        import hashlib
+        h = hashlib.sha256(f"{provider_idx}\0{model}\0{prompt}\0".encode('utf-8'))
+        for img in images:
+            # 按 base64 计算哈希 (与图片以 base64 保存时生成的键一致)，分块编码不生成完整副本
+            if isinstance(img, str):
+                h.update(img.encode('ascii'))
+            else:
+                for chunk in b64_chunks(img):
+                    h.update(chunk)
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self.conn:
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, value):
+        size = len(value.encode('utf-8'))
+        with self.lock:
+            with self.conn:
+                row = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, size, time.time())
+                )
+                self.total += size - (row[0] if row else 0)
+                if self.total > self.max_bytes:
+                    self._evict()
+
+    def _total(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        total = self.total = self._total()
+        if total <= self.max_bytes: return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if total <= self.max_bytes: break
+            victims.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.total = total
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,135 @@
+"""路径、配置文件与高级选项 (导入时无副作用，目录在首次使用时创建)"""
+import os
+import re
+import sys
+import json
+
+if getattr(sys, 'frozen', False):
+    ROOT_DIR = os.path.dirname(sys.executable)
+else:
+    ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
+CONFIG_FILE = os.path.join(ROOT_DIR, "config.json")
+DEBUG_LOG_FILE = os.path.join(ROOT_DIR, "api_debug.log")
+CACHE_DIR = os.path.join(ROOT_DIR, "cache")
+RESPONSE_CACHE_FILE = os.path.join(CACHE_DIR, "ai_responses.sqlite3")
+PROBE_CACHE_FILE = os.path.join(CACHE_DIR, "probe.sqlite3")
+
+# 服务商：名称 → 索引 (0=智谱, 1=Gemini)，以及各自的默认模型、config.json 中的 Key 字段、环境变量
+PROVIDERS = {"zhipu": 0, "gemini": 1}
+DEFAULT_MODELS = {0: "glm-4.6v-flash", 1: "gemini-2.5-flash"}
+CONFIG_KEYS = {0: "zhipu_key", 1: "gemini_key"}
+ENV_KEYS = {0: "GVS_ZHIPU_KEY", 1: "GVS_GEMINI_KEY"}
+
+# 高级选项默认值，可在 config.json 中覆盖
+DEFAULT_OPTIONS = {
+    "extract_mode": "stream", # stream=单进程流式解码, seek=逐秒截帧
+    "decode_workers": 0,      # 分段并行解码的 ffmpeg 进程数 (仅 stream 模式)，0=按 CPU 核数自动，1=不分段
+    "decode_segment_min": 10, # 每段最短秒数，视频短于两段时不分段
+    "decode_buffer_mb": 256,  # 分段并行解码时内存中暂存的帧的上限 (MB)，决定每段长度
+    "dedup": True,            # 丢弃与上一保留帧相同的字幕区域帧
+    "dedup_threshold": 0.12,  # 字幕笔画掩码的差异比例低于该值视为相同帧
+    "prefilter": True,        # 本地预筛：字幕区域没有文字特征的帧不上传
+    "prefilter_threshold": 0.15, # 预筛灵敏度：局部边缘占比低于该值视为无字幕，越小越保守
+    "refine_boundaries": True, # 本地高帧率解码边界附近的一秒，把起止时间校准到亚秒级
+    "refine_fps": 25,         # 校准时的解码帧率 (25 ≈ 40ms 精度)
+    "workers": 2,             # 同时在途的 AI 请求数
+    "cache": True,            # 本地缓存 AI 批次响应，重跑时不再重复计费
+    "cache_max_mb": 200,      # 缓存总大小上限，超出后按最近最少使用淘汰
+    "resume": True,           # 记录已完成批次，中断后同一视频/区域/模型可断点续传
+    "connect_timeout": 10,    # 建立连接超时 (秒)
+    "read_timeout": 60,       # 等待响应超时 (秒)
+    "api_base": "",           # 覆盖主服务商的服务地址，留空使用官方地址 (可指向本地模拟服务器)；备用服务商在 fallback_routes 中各自设置
+    "rate_limit_rpm": 0,      # 每分钟请求上限，0=不限 (被限流后按实际吞吐自动收紧)
+    "extra_keys": [],         # 同一服务商的其它 API Key，批次按各 Key 的剩余并发与耗时分配
+    "fallback_routes": [],    # 备用服务商 [{"provider": "gemini", "model": 可选, "key": 可选 (默认取 config.json), "api_base": 可选}]，主服务商的 Key 全部额度用尽后使用
+    "quota_cooldown_min": 60, # Key 无效或额度用尽后停用的分钟数
+    "max_retries": 4,         # 单个批次失败后的最大重试次数
+    "batch_size": 20,         # 每批初始帧数，之后按耗时与失败情况自动调整
+    "batch_min_frames": 2,    # 自动调整的帧数下限
+    "batch_max_frames": 40,   # 自动调整的帧数上限
+    "batch_max_mb": 8,        # 单次请求的图片数据上限 (base64, MB)
+    "batch_max_tokens": 32000, # 单次请求的图片 token 估算上限，0=不限
+    "batch_target_latency": 30, # 目标请求耗时 (秒)，超过则缩小批次，远低于则增大
+    "auto_band_samples": 30,  # "自动" 区域检测字幕带时抽取的帧数
+    "metrics_report": True,   # 每个任务在输出目录写出 <视频名>.metrics.json (各阶段耗时、计数、token 用量)
+    "metrics_prometheus": False, # 同时写出 Prometheus 文本格式 <视频名>.prom
+    "debug_log_level": "payload", # api_debug.log 记录级别: off / error / info (每批摘要) / payload (含原始响应)
+    "debug_payload_sample": 0.1, # 原始响应的采样比例 (错误与解析失败的响应总是记录)
+    "debug_log_max_mb": 20,   # 单个调试日志文件大小上限，超出后轮转
+    "debug_log_rotate_hours": 24, # 按时间轮转的间隔 (小时)，0=只按大小
+    "debug_log_backups": 5,   # 保留的历史日志个数
+    "debug_log_compress": True, # 轮转出的历史日志用 gzip 压缩
+    "mosaic": False,          # 拼图模式：同一批的字幕条纵向拼成少量长图发送
+    "mosaic_rows": 10,        # 每张拼图最多容纳的字幕条数
+    "mosaic_width": 1280,     # 拼图宽度上限 (像素)，更宽的字幕条等比缩小
+    "mosaic_max_kb": 300,     # 每张拼图的 JPEG 大小预算，超出时依次降低质量、转为灰度
+    "gui_log_max_lines": 5000, # 界面日志框保留的最大行数，更早的行自动丢弃
+    "gui_refresh_ms": 200,    # 界面刷新日志与进度条的间隔 (毫秒)
+}
+
+_ffmpeg_path_ready = False
+
+def ensure_ffmpeg_path():
+    """Windows 下把程序目录加入 PATH，以便找到随程序分发的 ffmpeg/ffprobe (只执行一次)"""
+    global _ffmpeg_path_ready
+    if _ffmpeg_path_ready: return
+    _ffmpeg_path_ready = True
+    if sys.platform == 'win32':
+        if getattr(sys, 'frozen', False):
+            application_path = os.path.dirname(sys.executable)
+        else:
+            application_path = ROOT_DIR
+        os.environ['PATH'] = application_path + os.pathsep + os.environ['PATH']
+
+def ensure_dir(path):
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except:
+            pass
+    return {}
+
+def options_from_config(cfg):
+    """从配置中取出 DEFAULT_OPTIONS 里定义的高级选项"""
+    return {k: cfg[k] for k in DEFAULT_OPTIONS if k in cfg}
+
+def redact_options(options):
+    """返回可对外展示 / 写入报告的选项副本：extra_keys 只保留末 4 位，fallback_routes 去掉 key"""
+    options = dict(options or {})
+    if options.get("extra_keys"):
+        options["extra_keys"] = ["…" + str(k)[-4:] for k in options["extra_keys"]]
+    if options.get("fallback_routes"):
+        options["fallback_routes"] = [{k: v for k, v in r.items() if k != "key"} if isinstance(r, dict) else r
+                                      for r in options["fallback_routes"]]
+    return options
+
+def option_keys(options):
+    """高级选项中出现的所有 API Key (extra_keys 与 fallback_routes[].key)"""
+    options = options or {}
+    keys = list(options.get("extra_keys") or [])
+    keys += [r.get("key") for r in options.get("fallback_routes") or [] if isinstance(r, dict)]
+    return [k for k in keys if k]
+
+def redact_text(text, keys=()):
+    """去掉日志 / 错误信息中的 API Key：URL 中的 key= 参数，以及 keys 中的 Key 原文 (只保留末 4 位)"""
+    text = re.sub(r"([?&]key=)[^&\s'\"]+", r"\1…", str(text))
+    for k in keys:
+        if k and len(k) > 4:
+            text = text.replace(k, "…" + k[-4:])
+    return text
+
+def save_config(new_data):
+    current = load_config()
+    current.update(new_data)
+    try:
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+    except:
+        pass
@@ -0,0 +1,160 @@
+"""
+API 调试日志：调用方只把消息放入队列，由后台线程写入 api_debug.log
+按大小 / 时间轮转 (api_debug.log.1, .2 ...，可 gzip 压缩)，原始响应按级别与采样率记录
+"""
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+from .config import DEBUG_LOG_FILE
+
+LEVELS = {"off": 0, "error": 1, "info": 2, "payload": 3}
+ERROR, INFO, PAYLOAD = 1, 2, 3
+
+
+class DebugLogSink:
+    """后台线程写日志；队列满时丢弃消息并计数，不阻塞请求线程"""
+    def __init__(self, path=DEBUG_LOG_FILE, level="payload", payload_sample=1.0, max_bytes=20 * 1024 * 1024,
+                 backups=5, rotate_hours=24, compress=True, queue_size=10000):
+        self.path = path
+        self.configure(level, payload_sample, max_bytes, backups, rotate_hours, compress)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.thread = None
+        self.lock = threading.Lock()
+        self.f = None
+        self.opened_at = 0.0
+
+    def configure(self, level="payload", payload_sample=1.0, max_bytes=20 * 1024 * 1024,
+                  backups=5, rotate_hours=24, compress=True):
+        self.level = LEVELS.get(level, LEVELS["payload"]) if isinstance(level, str) else int(level)
+        self.payload_sample = float(payload_sample)
+        self.max_bytes = int(max_bytes)
+        self.backups = int(backups)
+        self.rotate_seconds = float(rotate_hours) * 3600
+        self.compress = bool(compress)
+
+    def enabled(self, level):
+        if level > self.level: return False
+        if level == PAYLOAD and self.payload_sample < 1:
+            return random.random() < self.payload_sample
+        return True
+
+    def write(self, content, level=INFO):
+        if not self.enabled(level): return
+        self._ensure_thread()
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            self.queue.put_nowait(f"[{timestamp}] {content}\n{'-'*50}\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """等待队列中的消息写完 (退出前调用)"""
+        if self.thread is None: return
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _ensure_thread(self):
+        if self.thread is not None: return
+        with self.lock:
+            if self.thread is None:
+                import atexit
+                self.thread = threading.Thread(target=self._run, name="gvs-debuglog", daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if isinstance(item, threading.Event):
+                if self.f: self.f.flush()
+                item.set()
+                continue
+            batch = [item]
+            # 一次取出积压的消息合并写入
+            while len(batch) < 256:
+                try:
+                    nxt = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(nxt, threading.Event):
+                    self._write("".join(batch))
+                    batch = []
+                    if self.f: self.f.flush()
+                    nxt.set()
+                    continue
+                batch.append(nxt)
+            if batch:
+                self._write("".join(batch))
+            if self.f and self.queue.empty():
+                self.f.flush()
+
+    def _write(self, text):
+        try:
+            if self.f is None:
+                self._open()
+            elif self._should_rotate():
+                self._rotate()
+            if self.dropped:
+                self.f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {self.dropped} message(s) dropped (queue full)\n")
+                self.dropped = 0
+            self.f.write(text)
+        except OSError:
+            pass
+
+    def _open(self):
+        self.f = open(self.path, "a", encoding="utf-8")
+        self.opened_at = time.time()
+
+    def _should_rotate(self):
+        if self.max_bytes and self.f.tell() >= self.max_bytes: return True
+        return bool(self.rotate_seconds) and time.time() - self.opened_at >= self.rotate_seconds and self.f.tell() > 0
+
+    def _rotate(self):
+        """api_debug.log -> .1 (-> .1.gz)，已有的备份依次后移，超出 backups 的删除"""
+        self.f.close()
+        self.f = None
+        ext = ".gz" if self.compress else ""
+        for i in range(self.backups, 0, -1):
+            for suffix in (".gz", ""):
+                src = f"{self.path}.{i}{suffix}"
+                if not os.path.exists(src): continue
+                if i == self.backups:
+                    os.remove(src)
+                else:
+                    os.replace(src, f"{self.path}.{i + 1}{suffix}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+            if ext:
+                import gzip
+                import shutil
+                with open(f"{self.path}.1", "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+
+_sink = DebugLogSink()
+
+def configure_debug_log(options):
+    """按高级选项设置日志级别、采样率与轮转参数 (进程内所有任务共用)"""
+    _sink.configure(options["debug_log_level"], options["debug_payload_sample"],
+                    float(options["debug_log_max_mb"]) * 1024 * 1024, options["debug_log_backups"],
+                    options["debug_log_rotate_hours"], options["debug_log_compress"])
+
+def log_debug(content, level=INFO):
+    """写入调试日志 (非阻塞)；level: ERROR / INFO / PAYLOAD (原始响应，按采样率记录)"""
+    _sink.write(content, level)
+
+def flush_debug_log(timeout=5.0):
+    _sink.flush(timeout)
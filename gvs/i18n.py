@@ -0,0 +1,165 @@
+"""界面与日志文案 (中/英)，语言在首次调用 tr() 时检测"""
+import os
+
+TRANS = {
+    "zh": {
+        "title": "GVS 字幕提取 AI (v1.0)",
+        "No subtitles were generated":"未生成字幕，请查看错误日志",
+        "drop_hint": "拖拽或点击选择视频到此处",
+        "region": "区域:",
+        "provider": "服务:",
+        "model": "模型:",
+        "key_placeholder": "请输入 API Key (明文显示)",
+        "zhipu_key_ph": "请输入智谱 API Key",
+        "gemini_key_ph": "请输入 Google API Key",
+        "start_btn": "开始提取",
+        "stop_btn": "停止",
+        "open_dir_btn": "打开输出目录",
+        "ready": "已就绪: {}",
+        "load_file": "加载文件: {}",
+        "select_video": "选择视频",
+        "msg_hint": "提示",
+        "msg_no_video": "请先选择视频",
+        "msg_no_key": "请输入 {} 的API Key",
+        "task_start": "=== 开始任务: {} ===",
+        "service_info": "服务: {} | 模型: {}",
+        "cli_skip_path": "跳过不存在的路径: {}",
+        "cli_start": "{} 个视频，{} 个进程，日志目录: {}",
+        "cli_ok": "[成功] {} -> {} ({:.0f}s)",
+        "cli_fail": "[失败] {} (日志: {})",
+        "cli_crashed": "[失败] {} (工作进程异常退出: {})",
+        "cli_interrupted": "已中断。",
+        "cli_done": "完成: {} 个成功，{} 个失败",
+        "cli_failed_item": "  失败: {}",
+        "ffmpeg_error": "❌ 无法获取视频时长，请检查 ffmpeg。",
+        "video_info": "视频时长: {}秒，每批次最多 {} 帧 (按请求大小与耗时自动调整)",
+        "user_abort": "🛑 任务被用户中止。",
+        "ai_analyzing": "🔍 AI分析中: {} -> {}",
+        "smart_merge": "🔗 智能拼接: ...{}",
+        "dedup_stats": "🧹 画面去重: 共 {} 帧，实际上传 {} 帧",
+        "prefilter_stats": "⏭️ 本地预筛跳过无字幕画面: 共 {} 秒，{} 段 ({})",
+        "refine_done": "⏱️ 时间校准完成，调整了 {} 个边界",
+        "salvage_info": "🩹 AI 返回的 JSON 不完整，已恢复 {} 条，重新请求未覆盖的 {} 帧",
+        "cache_stats": "💾 响应缓存: 命中 {} 次，未命中 {} 次",
+        "resume_info": "♻️ 断点续传: 已完成 {} 个批次，最后进度 {}",
+        "limiter_stats": "🚦 请求统计: {}",
+        "band_detected": "🎯 自动检测字幕带: 画面高度 {:.1f}% - {:.1f}%",
+        "band_fallback": "🎯 未检测到稳定的字幕带，使用底部区域",
+        "decode_segments": "🧩 并行解码：按关键帧切分为 {0} 段 (共 {1} 个关键帧)，{2} 个 ffmpeg 进程同时解码",
+        "route_info": "🔀 多路由：共 {} 个 Key / 模型，按剩余并发与耗时分配批次",
+        "key_disabled": "⛔ {} 额度用尽或 Key 无效，停用 {:.0f} 分钟",
+        "route_failover": "🔀 主服务商的 Key 已全部停用，切换到备用: {}",
+        "batch_resize": "📦 批次大小调整: {} → {} 帧",
+        "batch_split": "✂️ 批次 {} - {} 失败，拆分为 {} = {} + {} 帧重试",
+        "keys_exhausted": "所有 API Key 均已停用 (额度用尽或无效)，任务中止；已识别的部分保留在断点日志中，额度恢复或更换 Key 后重新运行即可续传",
+        "batches_missing": "{} 个时间段识别失败 ({})，未生成正式字幕；已识别的部分在 {}，开启断点续传时重新运行只会请求缺失的部分",
+        "batch_rejected": "⛔ 批次 {} - {} 被服务端拒绝 (HTTP {})，不再拆分重试，请检查模型名称与参数",
+        "requests_rejected": "请求被服务端拒绝，任务中止 ({})；请检查模型名称与参数，修改后开启断点续传重新运行只会请求缺失的部分",
+        "save_success": "✅ 字幕已保存至: {}",
+        "save_fail": "❌ 保存SRT失败: {}",
+        "fatal_error": "❌ 严重错误: {}",
+        "api_fail": "❌ API 请求失败 (尝试 {}/{}): {}",
+        "rate_limit": "⚠️ 触发限流，暂停 {:.1f} 秒 ({})",
+        "common_error": "⚠️ 常规错误，{:.1f} 秒后重试...",
+        "stop_confirm_title": "任务运行中",
+        "stop_confirm_msg": "任务正在运行，确定要强制退出吗？",
+        "stopping": "正在停止...",
+        "force_stop": "正在强制终止线程...",
+        "regions": ["全画面", "底部", "中部", "顶部", "自动"],
+        "providers": ["智谱AI", "Gemini"]
+    },
+    "en": {
+        "No subtitles were generated":"No subtitles were generated. Please check the error log",
+        "title": "GVS Subtitle AI (v1.0)",
+        "drop_hint": "Drag & Drop &Click Video Here",
+        "region": "Region:",
+        "provider": "Service:",
+        "model": "Model:",
+        "key_placeholder": "Enter API Key (Plain Text)",
+        "zhipu_key_ph": "Enter Zhipu API Key",
+        "gemini_key_ph": "Enter Google API Key",
+        "start_btn": "Start",
+        "stop_btn": "Stop",
+        "open_dir_btn": "Open Output Dir",
+        "ready": "Ready: {}",
+        "load_file": "File Loaded: {}",
+        "select_video": "Select Video",
+        "msg_hint": "Hint",
+        "msg_no_video": "Please select a video first",
+        "msg_no_key": "Please enter API Key for {}",
+        "task_start": "=== Task Started: {} ===",
+        "service_info": "Service: {} | Model: {}",
+        "cli_skip_path": "Skipping missing path: {}",
+        "cli_start": "{} video(s), {} job(s), logs: {}",
+        "cli_ok": "[OK]   {} -> {} ({:.0f}s)",
+        "cli_fail": "[FAIL] {} (log: {})",
+        "cli_crashed": "[FAIL] {} (worker process died: {})",
+        "cli_interrupted": "Interrupted.",
+        "cli_done": "Done: {} succeeded, {} failed",
+        "cli_failed_item": "  failed: {}",
+        "ffmpeg_error": "❌ Cannot get video duration. Check ffmpeg.",
+        "video_info": "Duration: {}s, Batch Size: up to {} frames (auto-adjusted)",
+        "user_abort": "🛑 Task aborted by user.",
+        "ai_analyzing": "🔍 AI Analyzing: {} -> {}",
+        "smart_merge": "🔗 Smart Merge: ...{}",
+        "dedup_stats": "🧹 Dedup: {} frames, {} uploaded",
+        "prefilter_stats": "⏭️ Prefilter skipped frames without text: {}s in {} range(s) ({})",
+        "refine_done": "⏱️ Timing refined, {} boundaries adjusted",
+        "salvage_info": "🩹 Malformed JSON from AI: recovered {} item(s), re-requesting {} uncovered frame(s)",
+        "decode_segments": "🧩 Parallel decoding: {0} keyframe-aligned segments ({1} keyframes), {2} ffmpeg processes at a time",
+        "route_info": "🔀 Routing across {} keys / models by free capacity and latency",
+        "key_disabled": "⛔ {} quota exhausted or key invalid, disabled for {:.0f} min",
+        "route_failover": "🔀 All primary keys disabled, failing over to: {}",
+        "cache_stats": "💾 Response cache: {} hits, {} misses",
+        "resume_info": "♻️ Resuming: {} batches already done, last checkpoint {}",
+        "limiter_stats": "🚦 Request stats: {}",
+        "band_detected": "🎯 Subtitle band detected: {:.1f}% - {:.1f}% of frame height",
+        "band_fallback": "🎯 No stable subtitle band found, using bottom region",
+        "batch_resize": "📦 Batch size adjusted: {} → {} frames",
+        "batch_split": "✂️ Batch {} - {} failed, splitting {} = {} + {} frames and retrying",
+        "keys_exhausted": "All API keys are disabled (quota exhausted or invalid), job aborted; finished batches are kept in the resume journal, rerun after the quota resets or with another key to continue",
+        "batches_missing": "{} time range(s) failed ({}), the SRT was not finalized; partial subtitles are in {}; with resume enabled, rerunning only requests the missing ranges",
+        "batch_rejected": "⛔ Batch {} - {} rejected by the server (HTTP {}), not splitting; check the model name and parameters",
+        "requests_rejected": "Requests rejected by the server, job aborted ({}); check the model name and parameters, then rerun with resume enabled to request only the missing ranges",
+        "save_success": "✅ SRT Saved: {}",
+        "save_fail": "❌ Failed to save SRT: {}",
+        "fatal_error": "❌ Fatal Error: {}",
+        "api_fail": "❌ API Failed (Attempt {}/{}): {}",
+        "rate_limit": "⚠️ Rate limit hit, pausing {:.1f}s ({})",
+        "common_error": "⚠️ Error, retrying in {:.1f}s...",
+        "stop_confirm_title": "Task Running",
+        "stop_confirm_msg": "Task is running. Force quit?",
+        "stopping": "Stopping...",
+        "force_stop": "Forcing thread termination...",
+        "regions": ["Full Screen", "Bottom", "Middle", "Top", "Auto"],
+        "providers": ["Zhipu AI", "Gemini"]
+    }
+}
+
+_lang = None
+
+def detect_language():
+    """根据系统区域设置返回 'zh' 或 'en' (不依赖 Qt)"""
+    import locale
+    try:
+        sys_lang = (locale.getlocale()[0] or os.environ.get("LANG", "")).lower() # 例如 zh_cn, en_us
+    except Exception:
+        sys_lang = os.environ.get("LANG", "").lower()
+    # 判断逻辑：只要包含 zh, cn, hk, tw 则视为中文
+    if any(x in sys_lang for x in ['zh', 'cn', 'hk', 'tw', 'chinese']):
+        return 'zh'
+    return 'en'
+
+def get_language():
+    global _lang
+    if _lang is None:
+        _lang = detect_language()
+    return _lang
+
+def set_language(lang):
+    """GUI 使用 QLocale 检测到的语言覆盖默认值"""
+    global _lang
+    _lang = lang if lang in TRANS else 'en'
+
+def tr(key):
+    return TRANS[get_language()].get(key, key)
@@ -0,0 +1,519 @@
+"""单个视频的字幕提取流程：生产者线程截帧打包，线程池并发请求 AI，按顺序拼接并保存 SRT"""
+import os
+import re
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from datetime import datetime
+
+from .ai import APIError
+from .band import REGION_AUTO, detect_subtitle_band, has_text
+from .batching import BatchSizer, estimate_image_tokens
+from .cache import ResponseCache
+from .config import (DEFAULT_OPTIONS, OUTPUT_DIR, RESPONSE_CACHE_FILE, ensure_dir, option_keys,
+                     redact_options, redact_text)
+from .debuglog import configure_debug_log, flush_debug_log
+from .i18n import tr
+from .journal import BatchJournal
+from .metrics import Metrics
+from .media import (get_video_duration_ffmpeg, video_info, plan_segments, stream_frame_size, iter_frames_seek,
+                    iter_frames_stream, iter_frames_segments, encode_image_jpeg, frame_signature, dedup_signature, is_same_frame)
+from .refine import refine_boundaries
+from .router import build_router
+from .srt import SrtWriter, ms_to_srt_time
+
+class SubtitleJob:
+    """
+    单个视频的字幕提取任务 (与界面无关)
+    log(str) / progress(当前秒, 总秒数) 为回调，run() 成功时返回 SRT 路径，否则返回 None
+    """
+    def __init__(self, video_path, region_idx, api_key, model, provider_idx, options=None,
+                 log=None, progress=None, output_dir=None):
+        self.video_path = video_path
+        self.region_idx = region_idx # int
+        self.crop = region_idx # 实际裁切范围：区域索引，或自动检测出的 (上, 下) 比例
+        self.api_key = api_key
+        self.model = model
+        self.provider_idx = provider_idx # int
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+        self.log = log or (lambda s: None)
+        self.progress = progress or (lambda c, t: None)
+        self.output_dir = output_dir or OUTPUT_DIR
+        self.running = True
+        o = self.options
+        self.sizer = BatchSizer(o["batch_size"], o["batch_min_frames"], o["batch_max_frames"],
+                                int(o["batch_max_mb"] * 1024 * 1024), o["batch_max_tokens"], o["batch_target_latency"])
+        self.frame_count = 0
+        self.kept_frames = 0
+        self.skipped_ranges = [] # 本地预筛判定无字幕、未上传的时间段 [[start, end], ...]
+        self.failed_ranges = [] # 拆分重试后仍未识别的时间段，存在时不生成正式 SRT，保留断点日志以便续传
+        self.rejected = None # 首个被服务端拒绝的请求 (APIError)，出现后不再发送新的批次
+        self.lock = threading.Lock()
+        self.journal = None
+        self.writer = None
+        self.write_pool = None # 单线程：校准时间并写出定稿字幕，不占用调度 AI 批次的线程
+        self.pending_writes = deque()
+        self.refined = 0
+        self.metrics = Metrics()
+
+    def mosaic_params(self):
+        """拼图模式参数，未启用时返回 None"""
+        if not self.options["mosaic"]: return None
+        return {"rows": int(self.options["mosaic_rows"]), "width": int(self.options["mosaic_width"]),
+                "max_bytes": int(self.options["mosaic_max_kb"] * 1024)}
+
+    def iter_frames(self, total_seconds, start=0):
+        """按 extract_mode 选择截帧方式，从 start 秒开始产出 (秒, 裁切后的 Image)"""
+        if self.options["extract_mode"] == "seek":
+            # 关键帧表 (首次读取后缓存)：同一关键帧间隔内的各秒只解码一次
+            with self.metrics.timer("keyframe_index"):
+                info = video_info(self.video_path, keyframes=True)
+            keyframes = info["keyframes"] if info else None
+            yield from iter_frames_seek(self.video_path, total_seconds, self.crop, start, keyframes)
+            return
+        segments, workers, threads = self.decode_segments(total_seconds, start)
+        if len(segments) > 1:
+            frames = iter_frames_segments(self.video_path, self.crop, segments, threads=threads, workers=workers)
+        else:
+            frames = iter_frames_stream(self.video_path, self.crop, start=start)
+        with closing(frames):
+            for ts, img in frames:
+                sec = int(round(ts))
+                if sec > total_seconds: break
+                yield sec, img
+
+    def decode_segments(self, total_seconds, start=0):
+        """
+        分段并行解码的计划：返回 ([(段起点, 段终点)], 同时解码的段数, 每个 ffmpeg 的解码线程数)
+        decode_workers=0 时按 CPU 核数决定并行数；内存中至多暂存 并行数+1 段的帧，段长按 decode_buffer_mb 计算，
+        不足 decode_segment_min 秒时减少并行数；视频较短或只能并行 1 段时返回单段 (单进程流式解码)
+        """
+        single = [(start, None)], 1, None
+        cpus = os.cpu_count() or 1
+        workers = int(self.options["decode_workers"]) or min(8, max(1, cpus // 2))
+        min_seconds = max(1, int(self.options["decode_segment_min"]))
+        if workers <= 1 or total_seconds - start < 2 * min_seconds:
+            return single
+        size = stream_frame_size(self.video_path, self.crop)
+        if not size:
+            return single
+        # 每秒一帧 rgb24：预算内可暂存的帧数即秒数
+        budget = int(float(self.options["decode_buffer_mb"]) * 1024 * 1024 // (size[0] * size[1] * 3))
+        while workers > 1 and budget // (workers + 1) < min_seconds:
+            workers -= 1
+        if workers <= 1:
+            return single
+        with self.metrics.timer("keyframe_index"):
+            info = video_info(self.video_path, keyframes=True)
+        if not info or not info["keyframes"]:
+            return single
+        span = total_seconds + 1 - start
+        # 内存允许时每个进程一段，否则按预算切成更多的短段
+        seg_seconds = max(min_seconds, min(budget // (workers + 1), -(-span // workers)))
+        count = -(-span // seg_seconds)
+        segments = plan_segments(info["keyframes"], start, total_seconds + 1, count, min_seconds)
+        if len(segments) < 2:
+            return single
+        workers = min(workers, len(segments))
+        self.log(tr("decode_segments").format(len(segments), len(info["keyframes"]), workers))
+        return segments, workers, max(1, cpus // workers)
+
+    def run(self):
+        """执行任务，成功返回 SRT 路径，失败或中止返回 None"""
+        configure_debug_log(self.options)
+        provider_name = tr("providers")[self.provider_idx]
+        self.log(tr("task_start").format(os.path.basename(self.video_path)))
+        self.log(tr("service_info").format(provider_name, self.model))
+        
+        with self.metrics.timer("probe"):
+            duration = get_video_duration_ffmpeg(self.video_path)
+        if duration == 0:
+            self.log(tr("ffmpeg_error"))
+            return None
+        total_seconds = int(duration)
+        self.log(tr("video_info").format(total_seconds, self.sizer.size))
+
+        if self.region_idx == REGION_AUTO:
+            with self.metrics.timer("band_detect"):
+                band = detect_subtitle_band(self.video_path, duration, int(self.options["auto_band_samples"]))
+            if band:
+                self.crop = band
+                self.log(tr("band_detected").format(band[0] * 100, band[1] * 100))
+            else:
+                self.crop = 1
+                self.log(tr("band_fallback"))
+
+        from concurrent.futures import ThreadPoolExecutor, Future
+
+        cache = None
+        client = None
+        srt_path = None
+        try:
+            if self.options["cache"]:
+                cache = ResponseCache(RESPONSE_CACHE_FILE, int(self.options["cache_max_mb"]) * 1024 * 1024)
+            workers = max(1, int(self.options["workers"]))
+            client = build_router(self.provider_idx, self.api_key, self.model, self.options, self.log, cache=cache,
+                                  pool_size=workers,
+                                  timeout=(self.options["connect_timeout"], self.options["read_timeout"]),
+                                  api_base=self.options["api_base"] or None,
+                                  rpm=self.options["rate_limit_rpm"], max_retries=self.options["max_retries"],
+                                  mosaic=self.mosaic_params(), metrics=self.metrics,
+                                  quota_cooldown=float(self.options["quota_cooldown_min"]) * 60)
+            if client.multi:
+                self.log(tr("route_info").format(len(client.routes)))
+            # 只保留仍可能与后续批次合并的最后一条，其余定稿后立即写出
+            final_subtitles = []
+            done_batches = []
+            if self.options["resume"]:
+                self.journal = BatchJournal(self.journal_path(), BatchJournal.make_job_key(self.video_path, self.region_idx, self.provider_idx, self.model))
+                done_batches = self.journal.load()
+                if done_batches:
+                    self.log(tr("resume_info").format(len(done_batches), ms_to_srt_time(done_batches[-1]["end"])))
+            # 多个 Key / 服务商时，另写 <字幕名>.sources.tsv 记录每条字幕由哪个 Key 和模型识别
+            self.writer = SrtWriter(self.srt_path(reuse_part=bool(done_batches)), sources=client.multi)
+            self.write_pool = ThreadPoolExecutor(max_workers=1)
+            
+            # 生产者线程负责解码/裁切/去重/打包，主线程调度 N 个并发 AI 请求
+            batch_queue = queue.Queue(maxsize=workers * 2)
+            abort = threading.Event()
+            producer = threading.Thread(target=self.produce_batches, args=(total_seconds, batch_queue, abort, done_batches), daemon=True)
+            producer.start()
+            
+            pending = deque()
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    while True:
+                        item = batch_queue.get()
+                        if item is None: break
+                        if isinstance(item, Exception): raise item
+                        if client.exhausted:
+                            # 所有 Key 都已停用：后续批次必然失败，中止任务 (断点日志与 .part 保留，额度恢复后可续传)
+                            raise RuntimeError(tr("keys_exhausted"))
+                        if self.rejected:
+                            # 请求被拒绝通常是模型名称或参数错误，其余批次也会同样失败
+                            raise RuntimeError(tr("requests_rejected").format(self.rejected))
+                        if isinstance(item, dict):
+                            # 断点日志中已完成的批次，不再请求，按原位置参与拼接
+                            fut = Future()
+                            fut.set_result(item["results"])
+                            pending.append(fut)
+                        else:
+                            pending.append(pool.submit(self.request_batch, client, item))
+                        # 按批次先后顺序合并 (即按 batch_start_sec 排序)，结果与串行执行一致
+                        while len(pending) >= workers or (pending and pending[0].done()):
+                            result = pending.popleft().result()
+                            with self.metrics.timer("merge"):
+                                self.merge_batch_results(result, final_subtitles)
+                            self.flush_subtitles(final_subtitles)
+                    while pending:
+                        result = pending.popleft().result()
+                        with self.metrics.timer("merge"):
+                            self.merge_batch_results(result, final_subtitles)
+                        self.flush_subtitles(final_subtitles)
+            finally:
+                abort.set()
+                producer.join()
+            
+            if self.options["dedup"] and self.frame_count:
+                self.log(tr("dedup_stats").format(self.frame_count, self.kept_frames))
+            if self.skipped_ranges:
+                skipped = sum(e - s for s, e in self.skipped_ranges)
+                preview = ", ".join(f"{ms_to_srt_time(s)}-{ms_to_srt_time(e)}" for s, e in self.skipped_ranges[:5])
+                if len(self.skipped_ranges) > 5: preview += ", ..."
+                self.log(tr("prefilter_stats").format(skipped, len(self.skipped_ranges), preview))
+            if cache:
+                self.log(tr("cache_stats").format(cache.hits, cache.misses))
+            self.log(tr("limiter_stats").format(client.describe()))
+                
+            if self.running:
+                self.flush_subtitles(final_subtitles, final=True)
+                self.wait_writes()
+                if self.options["refine_boundaries"]:
+                    self.log(tr("refine_done").format(self.refined))
+                if self.rejected:
+                    raise RuntimeError(tr("requests_rejected").format(self.rejected))
+                if self.failed_ranges:
+                    # 有时间段缺失：不生成正式 SRT、不删除断点日志，重新运行时只请求缺失的部分
+                    failed = sorted(self.failed_ranges)
+                    preview = ", ".join(f"{ms_to_srt_time(s)}-{ms_to_srt_time(e)}" for s, e in failed[:5])
+                    if len(failed) > 5: preview += ", ..."
+                    raise RuntimeError(tr("batches_missing").format(len(failed), preview, self.writer.part_path))
+                if not self.writer.count:
+                    self.writer.close(remove=True)
+                    raise RuntimeError(tr("No subtitles were generated"))
+                srt_path = self.save_srt()
+                if srt_path and self.journal:
+                    self.journal.close(remove=True)
+
+        except Exception as e:
+            self.log(tr("fatal_error").format(redact_text(e, [self.api_key] + option_keys(self.options))))
+            import traceback
+            traceback.print_exc()
+        finally:
+            if client:
+                client.close()
+            if cache:
+                cache.close()
+            if self.journal:
+                self.journal.close()
+            if self.write_pool:
+                self.write_pool.shutdown(wait=True)
+            if self.writer:
+                self.writer.close()
+            self.write_metrics(srt_path)
+            flush_debug_log()
+            
+        return srt_path
+
+    def produce_batches(self, total_seconds, batch_queue, abort, done_batches=()):
+        """
+        生产者线程：解码、裁切、去重并打包，批次按时间顺序放入有界队列，结束时放入 None
+        done_batches 为断点日志中已完成的批次，按时间位置原样放入队列，其覆盖的帧跳过
+        """
+        def put(item):
+            while not abort.is_set():
+                try:
+                    batch_queue.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    pass
+
+        di = 0
+        spans = []
+        def put_done_until(sec):
+            # 放入开始时间不晚于 sec 的已完成批次，先把手头的批次发出以保持时间顺序
+            nonlocal di, spans
+            while di < len(done_batches) and done_batches[di]["start"] <= sec:
+                if spans:
+                    put(spans)
+                    spans = []
+                put(done_batches[di])
+                di += 1
+
+        try:
+            last_key = None
+            dedup = self.options["dedup"]
+            prefilter = self.options["prefilter"]
+            # 从已完成的连续前缀之后开始解码
+            resume_from = 0
+            for entry in done_batches:
+                if entry["start"] > resume_from: break
+                resume_from = max(resume_from, int(entry["end"]))
+            
+            with closing(self.metrics.timed_iter("decode", self.iter_frames(total_seconds, resume_from))) as frames:
+                for sec, img in frames:
+                    if not self.running: 
+                        self.log(tr("user_abort"))
+                        break
+                    if abort.is_set(): break
+                    
+                    put_done_until(sec)
+                    if di > 0 and sec < done_batches[di - 1]["end"]:
+                        img = None # 已完成批次覆盖的帧
+                    
+                    if img is not None:
+                        self.frame_count += 1
+                        self.metrics.inc("frames_decoded")
+                        with self.metrics.timer("filter"):
+                            key = dedup_signature(img) if dedup else None
+                            sig = key[0] if key else frame_signature(img) if prefilter else None
+                            empty = prefilter and not has_text(sig, self.options["prefilter_threshold"])
+                        if empty:
+                            self.metrics.inc("frames_dropped_prefilter")
+                            # 无字幕的帧不上传；相邻的跳过时间段合并记录
+                            if self.skipped_ranges and self.skipped_ranges[-1][1] == sec:
+                                self.skipped_ranges[-1][1] = sec + 1
+                            else:
+                                self.skipped_ranges.append([sec, sec + 1])
+                            self.progress(sec, total_seconds)
+                            continue
+                        # 与上一保留帧的字幕相同且时间连续：只延长其覆盖时间段，不再上传
+                        if spans and dedup and spans[-1]["end"] == sec and is_same_frame(key, last_key, self.options["dedup_threshold"]):
+                            spans[-1]["end"] = sec + 1
+                            self.metrics.inc("frames_dropped_dedup")
+                        else:
+                            with self.metrics.timer("encode"):
+                                jpeg = encode_image_jpeg(img)
+                            if not jpeg:
+                                self.metrics.inc("frames_dropped_encode")
+                            else:
+                                span = {"start": sec, "end": sec + 1, "image": jpeg, "tokens": estimate_image_tokens(*img.size)}
+                                # 新画面到来时才判断上一批是否已满 (帧数/字节/token)，保证最后一张的时间段已完整
+                                if self.sizer.is_full(spans, span):
+                                    put(spans)
+                                    spans = []
+                                spans.append(span)
+                                self.kept_frames += 1
+                                self.metrics.inc("frames_uploaded")
+                                last_key = key
+                    
+                    self.progress(sec, total_seconds)
+            
+            if self.running and not abort.is_set():
+                put_done_until(float('inf'))
+                if spans:
+                    put(spans)
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    def request_batch(self, client, spans):
+        """
+        在工作线程中发送一个批次，返回 AI 识别结果列表，成功的批次写入断点日志
+        失败或超时的多帧批次对半拆分后分别重试，直到单帧；只要有一部分成功就返回已识别的结果
+        请求被服务端拒绝 (不可重试的 4xx) 时不拆分，之后的批次也不再发送，由主循环中止任务
+        """
+        if not self.running: return None
+
+        start_sec, end_sec = spans[0]["start"], spans[-1]["end"]
+        if self.rejected:
+            self.mark_failed(start_sec, end_sec)
+            return None
+        self.log(tr("ai_analyzing").format(ms_to_srt_time(start_sec), ms_to_srt_time(end_sec)))
+        started = time.monotonic()
+        try:
+            ai_results = client.chat_smart_batch(spans, split_on_timeout=True)
+        except APIError as e:
+            # 请求本身被拒绝 (模型名错误、参数不合法)，拆分后同样会失败
+            self.metrics.inc("batch_failures")
+            self.log(tr("batch_rejected").format(ms_to_srt_time(start_sec), ms_to_srt_time(end_sec), e.status))
+            self.rejected = self.rejected or e
+            self.mark_failed(start_sec, end_sec)
+            return None
+        elapsed = time.monotonic() - started
+        self.metrics.observe("batch", elapsed)
+        self.metrics.inc("batches" if ai_results is not None else "batch_failures")
+        old_size = self.sizer.size
+        new_size = self.sizer.record(len(spans), elapsed, ai_results is not None)
+        if new_size != old_size:
+            self.log(tr("batch_resize").format(old_size, new_size))
+
+        if ai_results is not None:
+            if self.journal:
+                self.journal.append(start_sec, end_sec, ai_results)
+            return ai_results
+        if len(spans) < 2 or not self.running or client.exhausted:
+            self.mark_failed(start_sec, end_sec)
+            return None
+
+        # 拆分后的两半各自成功的部分单独写入断点日志，续传时只重试仍失败的时间段
+        mid = len(spans) // 2
+        self.metrics.inc("batch_splits")
+        self.log(tr("batch_split").format(ms_to_srt_time(start_sec), ms_to_srt_time(end_sec), len(spans), mid, len(spans) - mid))
+        left = self.request_batch(client, spans[:mid])
+        right = self.request_batch(client, spans[mid:])
+        if left is None and right is None:
+            return None
+        return (left or []) + (right or [])
+
+    def mark_failed(self, start, end):
+        with self.lock:
+            self.failed_ranges.append((start, end))
+
+    def merge_batch_results(self, ai_results, final_subtitles):
+        """按时间顺序把一个批次的结果拼接进 final_subtitles"""
+        if not ai_results:
+            return
+
+        for item in ai_results:
+            text = item.get('text', '').strip()
+            if not text or self.is_junk(text): continue
+            
+            s_time = float(item.get('start', 0))
+            e_time = float(item.get('end', 0))
+            
+            if final_subtitles:
+                last_global = final_subtitles[-1]
+                if self.is_same_sentence(last_global['text'], text):
+                    if abs(s_time - last_global['end']) <= 2.5: 
+                        self.log(tr("smart_merge").format(text[-5:]))
+                        last_global['end'] = max(last_global['end'], e_time)
+                        continue 
+            
+            final_subtitles.append({"start": s_time, "end": e_time, "text": text, "source": item.get("source")})
+
+    def flush_subtitles(self, final_subtitles, final=False):
+        """
+        除最后一条外的字幕已不会再与后续批次合并：移出内存，交给写出线程校准时间后追加写入 SRT
+        写出线程只有一个，按提交顺序写出；final=True 时全部写出
+        """
+        ready = list(final_subtitles if final else final_subtitles[:-1])
+        if not ready: return
+        del final_subtitles[:len(ready)]
+        # 顺便取回已完成的写出，尽早抛出其中的异常
+        while self.pending_writes and self.pending_writes[0].done():
+            self.pending_writes.popleft().result()
+        self.pending_writes.append(self.write_pool.submit(self.write_subtitles, ready))
+
+    def wait_writes(self):
+        """等待已提交的字幕全部写出"""
+        while self.pending_writes:
+            self.pending_writes.popleft().result()
+
+    def write_subtitles(self, cues):
+        """写出线程：高帧率校准起止时间 (可选) 后追加写入 SRT"""
+        if self.options["refine_boundaries"] and self.running:
+            with self.metrics.timer("refine"):
+                self.refined += refine_boundaries(self.video_path, self.crop, cues, int(self.options["refine_fps"]),
+                                                  int(self.options["workers"]), lambda: self.running)
+        with self.metrics.timer("write"):
+            self.writer.write(cues)
+        self.metrics.inc("cues_written", len(cues))
+
+    def write_metrics(self, srt_path):
+        """导出本次运行的指标报告 <视频名>.metrics.json，可选 Prometheus 文本格式 <视频名>.prom"""
+        if not (self.options["metrics_report"] or self.options["metrics_prometheus"]): return
+        base = os.path.join(ensure_dir(self.output_dir), os.path.splitext(os.path.basename(self.video_path))[0])
+        try:
+            if self.options["metrics_report"]:
+                self.metrics.write_json(base + ".metrics.json", video=self.video_path, provider=self.provider_idx,
+                                        model=self.model, srt=srt_path, options=redact_options(self.options))
+            if self.options["metrics_prometheus"]:
+                self.metrics.write_prometheus(base + ".prom", {"video": os.path.basename(self.video_path), "model": self.model})
+        except OSError as e:
+            self.log(tr("fatal_error").format(str(e)))
+
+    def is_same_sentence(self, t1, t2):
+        def clean(s): return re.sub(r'[^\w]', '', s).lower()
+        return clean(t1) == clean(t2)
+
+    def is_junk(self, text):
+        if not text: return True
+        low = text.lower()
+        if "no subtitle" in low: return True
+        if "no text" in low: return True
+        if text == "[EMPTY]": return True
+        return False
+
+    def journal_path(self):
+        """断点日志与输出字幕放在同一目录"""
+        base_name = os.path.splitext(os.path.basename(self.video_path))[0]
+        return os.path.join(ensure_dir(self.output_dir), f"{base_name}.gvs-journal")
+
+    def srt_path(self, reuse_part=False):
+        """
+        输出 SRT 路径，同名 SRT 或 .part (可能正被其它任务写入) 已存在时加时间后缀，不覆盖
+        reuse_part: 断点续传时沿用上次中断留下的 .part (从头重新写入)
+        """
+        base_name = os.path.splitext(os.path.basename(self.video_path))[0]
+        full_path = os.path.join(ensure_dir(self.output_dir), f"{base_name}.srt")
+        if os.path.exists(full_path) or (os.path.exists(full_path + ".part") and not reuse_part):
+            timestamp = datetime.now().strftime("%H%M%S")
+            full_path = os.path.join(self.output_dir, f"{base_name}-{timestamp}.srt")
+        return full_path
+
+    def save_srt(self):
+        """把已增量写出的 .part 文件原子替换为正式 SRT"""
+        try:
+            full_path = self.writer.finish()
+            self.log(tr("save_success").format(full_path))
+            return full_path
+        except Exception as e:
+            self.log(tr("save_fail").format(str(e)))
+            return None
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,71 @@
+"""批次断点日志"""
+import os
+import json
+import threading
+
+class BatchJournal:
+    """
+    批次断点日志 (追加写入的 JSON Lines)
+    首行记录任务标识，之后每完成一个批次追加一行 {"start", "end", "results"}
+    """
+    def __init__(self, path, job_key):
+        self.path = path
+        self.job_key = job_key
+        self.lock = threading.Lock()
+        self.f = None
+
+    @staticmethod
+    def make_job_key(video_path, region_idx, provider_idx, model):
+        import hashlib
+        st = os.stat(video_path)
+        raw = f"{os.path.abspath(video_path)}|{st.st_size}|{int(st.st_mtime)}|{region_idx}|{provider_idx}|{model}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def load(self):
+        """读取同一任务已完成的批次 (按开始时间排序)，任务不匹配则重新开始"""
+        entries = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            try:
+                header = json.loads(lines[0]) if lines else {}
+            except json.JSONDecodeError:
+                header = {}
+            if header.get("job") == self.job_key:
+                for line in lines[1:]:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # 进程被强制终止时最后一行可能不完整
+                        pass
+        entries.sort(key=lambda e: e["start"])
+
+        # 重写日志：丢弃不完整的行，不匹配的旧任务直接覆盖
+        # 先写到临时文件再原子替换，重写途中被终止也不会丢失已完成的批次
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for obj in [{"job": self.job_key}] + entries:
+                f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.f = open(self.path, 'a', encoding='utf-8')
+        return entries
+
+    def append(self, start, end, results):
+        with self.lock:
+            if self.f:
+                self._write({"start": start, "end": end, "results": results})
+
+    def _write(self, obj):
+        self.f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self, remove=False):
+        with self.lock:
+            if self.f:
+                self.f.close()
+                self.f = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,393 @@
+"""
+ffmpeg/ffprobe 截帧与探测、字幕区域裁切、JPEG 编码与画面变化检测
+PIL 在函数内按需导入，仅使用探测函数时不会加载
+"""
+import os
+import io
+import base64
+import threading
+import subprocess
+
+from .config import PROBE_CACHE_FILE, ensure_ffmpeg_path
+
+def _hidden_startupinfo():
+    """Windows 下隐藏 ffmpeg/ffprobe 的控制台窗口"""
+    ensure_ffmpeg_path()
+    startupinfo = None
+    if os.name == 'nt':
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
+
+def extract_frame_ffmpeg(video_path, time_sec):
+    try:
+        cmd = [
+            'ffmpeg', '-ss', str(time_sec), '-i', video_path,
+            '-vframes', '1', '-q:v', '2', '-f', 'image2', 'pipe:1'
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=_hidden_startupinfo(), check=False)
+        return result.stdout if result.returncode == 0 else None
+    except:
+        return None
+
+# extract_frames_gop 每次最多取出的秒数 (输出的 JPEG 全部在内存中，select 表达式每秒一项)
+GOP_CHUNK_SECONDS = 30
+
+def extract_frames_gop(video_path, keyframe, seconds):
+    """
+    从关键帧 keyframe 起只解码一次，取出 seconds 中每一秒的帧 (各取不早于该时刻的第一帧)，返回 JPEG 字节列表
+    seconds 应位于同一关键帧间隔内，且不超过 GOP_CHUNK_SECONDS 秒；帧数对不上 (例如视频帧率低于 1fps) 时返回 None，由调用方逐秒截帧
+    """
+    offsets = [round(sec - keyframe, 3) for sec in seconds]
+    picks = "+".join(f"gte(t,{o})*(isnan(prev_t)+lt(prev_t,{o}))" for o in offsets)
+    try:
+        cmd = [
+            'ffmpeg', '-v', 'error', '-ss', str(keyframe), '-i', video_path, '-t', str(offsets[-1] + 0.5),
+            '-an', '-sn', '-vf', f"select='{picks}'", '-vsync', '0',
+            '-q:v', '2', '-f', 'image2pipe', '-c:v', 'mjpeg', 'pipe:1'
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=_hidden_startupinfo(), check=False)
+    except OSError:
+        return None
+    if result.returncode != 0: return None
+    # 按 JPEG 结束标记切分 (ffmpeg 输出的 mjpeg 帧不含缩略图)
+    frames, data, pos = [], result.stdout, 0
+    while True:
+        end = data.find(b"\xff\xd9", pos)
+        if end == -1: break
+        frames.append(data[pos:end + 2])
+        pos = end + 2
+    return frames if len(frames) == len(seconds) else None
+
+def region_bounds(region_idx, h):
+    """
+    返回裁切区域的纵向范围 (y_start, y_end)
+    region_idx: 0=全画面, 1=底部, 2=中部, 3=顶部，或 (上, 下) 占画面高度的比例 (自动检测的字幕带)
+    """
+    if isinstance(region_idx, (tuple, list)):
+        return int(h * region_idx[0]), max(int(h * region_idx[0]) + 2, int(h * region_idx[1]))
+    # 默认全画面
+    y_start, y_end = 0, h
+    if region_idx == 1: # 底部 (取下 1/3)
+        y_start = int(h * 0.66)
+    elif region_idx == 3: # 顶部 (取上 1/3)
+        y_end = int(h * 0.33)
+    elif region_idx == 2: # 中部 (取中间 1/3)
+        y_start = int(h * 0.33)
+        y_end = int(h * 0.66)
+    # region_idx == 0: 全画面，不做改变
+    return y_start, y_end
+
+def crop_image(img_bytes, region_idx):
+    """根据索引裁切图片，返回 PIL Image (过小时放大 2 倍)"""
+    if not img_bytes: return None
+    from PIL import Image
+    try:
+        img = Image.open(io.BytesIO(img_bytes))
+        w, h = img.size
+        y_start, y_end = region_bounds(region_idx, h)
+        cropped_img = img.crop((0, y_start, w, y_end))
+
+        cw, ch = cropped_img.size
+        # 如果图片过小，进行放大，提高OCR准确率
+        if ch < 100:
+            cropped_img = cropped_img.resize((int(cw * 2), int(ch * 2)), Image.Resampling.BICUBIC)
+        return cropped_img
+    except:
+        return None
+
+def encode_image_jpeg(img):
+    """将裁切后的图片编码为 JPEG(q95) 字节 (发送时才转为 base64)"""
+    if img is None: return None
+    try:
+        out_buffer = io.BytesIO()
+        img.convert('RGB').save(out_buffer, format='JPEG', quality=95)
+        return out_buffer.getvalue()
+    except:
+        return None
+
+def encode_image_b64(img):
+    """将裁切后的图片编码为 JPEG(q95) 并转为 base64 字符串"""
+    data = encode_image_jpeg(img)
+    return base64.b64encode(data).decode('utf-8') if data else None
+
+def frame_signature(img):
+    """字幕区域的廉价指纹：宽 640 的灰度缩略图，用于相邻帧变化检测"""
+    if img is None: return None
+    from PIL import Image
+    w, h = img.size
+    tw = min(640, w)
+    th = max(1, int(h * tw / w))
+    return img.convert('L').resize((tw, th), Image.Resampling.BILINEAR)
+
+def change_ratio(sig_a, sig_b):
+    """像素差分：两张签名图中差值超过 32 的像素占比"""
+    from PIL import ImageChops
+    hist = ImageChops.difference(sig_a, sig_b).histogram()
+    return sum(hist[32:]) / (sig_a.size[0] * sig_a.size[1])
+
+def edge_map(gray, edge_threshold):
+    """水平梯度 (与左侧相邻像素之差) 超过阈值的像素记为 255，其余为 0；文字笔画的左右边缘密集"""
+    from PIL import ImageChops
+    grad = ImageChops.difference(gray, ImageChops.offset(gray, 1, 0))
+    return grad.point(lambda v: 255 if v > edge_threshold else 0)
+
+def text_mask(gray, edge_threshold=128, cell=3, density=0.12):
+    """
+    字幕笔画掩码：强水平边缘 (笔画与描边) 按 3x3 小格统计，占比达到 density 的格记为 255，其余为 0
+    背景纹理的边缘大多弱于字幕描边，背景平移、轻微晃动时掩码基本不变
+    """
+    from PIL import Image
+    w, h = gray.size
+    edges = edge_map(gray, edge_threshold)
+    cells = edges.resize((max(1, w // cell), max(1, h // cell)), Image.Resampling.BOX)
+    return cells.point(lambda v: 255 if v >= density * 255 else 0)
+
+def dedup_signature(img):
+    """画面去重用的指纹：(灰度缩略图, 字幕笔画掩码)"""
+    sig = frame_signature(img)
+    return (sig, text_mask(sig)) if sig is not None else None
+
+def mask_change_ratio(mask_a, mask_b, min_cells=0.002):
+    """
+    两张笔画掩码中不一致的格占两者并集的比例
+    并集不足全部格数的 min_cells (无字幕、字太小或笔画太细) 时返回 None，掩码不足以判断
+    """
+    from PIL import ImageChops
+    union = ImageChops.lighter(mask_a, mask_b).histogram()[255]
+    if union < mask_a.size[0] * mask_a.size[1] * min_cells: return None
+    return ImageChops.difference(mask_a, mask_b).histogram()[255] / union
+
+def is_same_frame(sig_a, sig_b, threshold=0.12, pixel_threshold=0.0002):
+    """
+    sig_a / sig_b 为 dedup_signature 的结果
+    整幅像素几乎不变 (变化像素占比低于 pixel_threshold) 即为同一画面；变化只出现在字幕笔画附近说明字幕变了；
+    笔画以外也在变 (背景运动) 时只比较笔画掩码，差异低于 threshold 视为同一画面
+    """
+    if sig_a is None or sig_b is None or sig_a[0].size != sig_b[0].size: return False
+    from PIL import Image, ImageChops, ImageFilter
+    (gray_a, mask_a), (gray_b, mask_b) = sig_a, sig_b
+    changed = ImageChops.difference(gray_a, gray_b).point(lambda v: 255 if v > 32 else 0)
+    total = gray_a.size[0] * gray_a.size[1]
+    if changed.histogram()[255] < total * pixel_threshold: return True
+    # 两帧笔画所在的格向外扩一格，放大回缩略图尺寸后作为字幕区域
+    region = ImageChops.lighter(mask_a, mask_b).filter(ImageFilter.MaxFilter(3)).resize(gray_a.size, Image.Resampling.NEAREST)
+    if ImageChops.subtract(changed, region).histogram()[255] < total * pixel_threshold: return False
+    ratio = mask_change_ratio(mask_a, mask_b)
+    return ratio is not None and ratio < threshold
+
+def iter_frames_seek(video_path, total_seconds, region_idx, start=0, keyframes=None):
+    """
+    逐秒截帧 (旧方式)，产出 (秒, 裁切后的 Image)
+    提供关键帧表时，同一关键帧间隔内的各秒由一个 ffmpeg 从该关键帧起解码一次取出，
+    不再每一秒都重新定位关键帧并重复解码前面的帧
+    """
+    if not keyframes:
+        for sec in range(start, total_seconds + 1):
+            yield sec, crop_image(extract_frame_ffmpeg(video_path, sec), region_idx)
+        return
+    import bisect
+    groups = {}
+    for sec in range(start, total_seconds + 1):
+        i = bisect.bisect_right(keyframes, sec) - 1
+        groups.setdefault(keyframes[i] if i >= 0 else 0.0, []).append(sec)
+    for keyframe, group in groups.items():
+        # 关键帧间隔很长 (或整个视频只有一个关键帧) 时分段取帧，限制每个 ffmpeg 的输出缓冲与 select 表达式长度
+        for i in range(0, len(group), GOP_CHUNK_SECONDS):
+            seconds = group[i:i + GOP_CHUNK_SECONDS]
+            frames = extract_frames_gop(video_path, keyframe, seconds) if len(seconds) > 1 else None
+            if frames is None:
+                frames = [extract_frame_ffmpeg(video_path, sec) for sec in seconds]
+            for sec, data in zip(seconds, frames):
+                yield sec, crop_image(data, region_idx)
+
+def _stream_filters(video_path, region_idx, fps):
+    """流式解码的滤镜链：fps 抽帧、转 rgb24、裁切，过小时放大 2 倍；返回 (filters, 宽, 高)，探测失败返回 None"""
+    size = get_video_size_ffmpeg(video_path)
+    if not size: return None
+    w, h = size
+    y_start, y_end = region_bounds(region_idx, h)
+    cw, ch = w, y_end - y_start
+    filters = [f"fps={fps}", "format=rgb24", f"crop={cw}:{ch}:0:{y_start}"]
+    # 与 crop_image 一致：过小时放大 2 倍
+    if ch < 100:
+        cw, ch = cw * 2, ch * 2
+        filters.append(f"scale={cw}:{ch}:flags=bicubic")
+    return filters, cw, ch
+
+def stream_frame_size(video_path, region_idx):
+    """流式解码产出的每帧 (宽, 高)，探测失败返回 None"""
+    params = _stream_filters(video_path, region_idx, 1)
+    return params[1:] if params else None
+
+def iter_frames_stream(video_path, region_idx, fps=1, start=0, duration=None, threads=None):
+    """
+    单个常驻 ffmpeg 进程流式解码：fps/crop/scale 滤镜图在 ffmpeg 内完成，
+    rgb24 原始帧写入管道，逐帧产出 (时间戳秒, 裁切后的 Image)；threads 为 ffmpeg 的解码线程数
+    """
+    params = _stream_filters(video_path, region_idx, fps)
+    if not params: return
+    filters, cw, ch = params
+
+    cmd = ['ffmpeg', '-v', 'error']
+    if threads: cmd += ['-threads', str(threads)]
+    if start: cmd += ['-ss', str(start)]
+    cmd += ['-i', video_path]
+    if duration is not None: cmd += ['-t', str(duration)]
+    cmd += ['-an', '-sn', '-vf', ','.join(filters), '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1']
+
+    from PIL import Image
+    frame_bytes = cw * ch * 3
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, startupinfo=_hidden_startupinfo())
+    try:
+        idx = 0
+        while True:
+            buf = proc.stdout.read(frame_bytes)
+            if len(buf) < frame_bytes: break
+            yield round(start + idx / fps, 3), Image.frombuffer('RGB', (cw, ch), buf, 'raw', 'RGB', 0, 1)
+            idx += 1
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+def plan_segments(keyframes, start, end, count, min_seconds=120):
+    """
+    把 [start, end) 秒切成至多 count 段，每段不短于 min_seconds；返回 [(段起点, 段终点)]，最后一段终点为 None (到结尾)
+    分界取理想位置之后第一个关键帧向上取整的秒数：seek 直接落在该关键帧上，且抽帧时间点与整体解码一致
+    """
+    import bisect
+    import math
+    count = max(1, min(int(count), int((end - start) // max(1, min_seconds))))
+    bounds = [start]
+    for i in range(1, count):
+        ideal = start + (end - start) * i / count
+        j = bisect.bisect_left(keyframes, ideal)
+        if j >= len(keyframes): break
+        b = math.ceil(keyframes[j])
+        if bounds[-1] < b < end:
+            bounds.append(b)
+    return list(zip(bounds, bounds[1:] + [None]))
+
+def iter_frames_segments(video_path, region_idx, segments, fps=1, threads=None, workers=None):
+    """
+    分段并行解码：至多 workers 个 ffmpeg 进程同时解码相邻的段 (与 iter_frames_stream 相同的 rgb24 管道，帧不经有损压缩)，
+    每段解码完成后暂存在内存中，按段的先后顺序产出 (时间戳秒, Image)
+    解码最多领先读取位置 workers 段：后续流程 (AI 批次队列) 跟不上时解码随之暂停，内存中至多 workers + 1 段的帧
+    """
+    from collections import deque
+    from contextlib import closing
+    from concurrent.futures import ThreadPoolExecutor
+    workers = max(1, int(workers or len(segments)))
+    stop = threading.Event()
+
+    def decode(start, end):
+        frames = []
+        duration = None if end is None else end - start
+        with closing(iter_frames_stream(video_path, region_idx, fps, start, duration, threads)) as it:
+            for ts, img in it:
+                if stop.is_set() or (end is not None and ts >= end): break
+                frames.append((ts, img))
+        return frames
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gvs-decode")
+    todo = iter(segments)
+    pending = deque()
+    try:
+        for seg in todo:
+            pending.append(pool.submit(decode, *seg))
+            if len(pending) >= workers: break
+        while pending:
+            frames = pending.popleft().result()
+            # 取走一段即开始解码下一段
+            for seg in todo:
+                pending.append(pool.submit(decode, *seg))
+                break
+            frames.reverse()
+            while frames:
+                yield frames.pop()
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def probe_video(video_path, keyframes=False):
+    """
+    ffprobe 探测，返回 {"duration", "start_time", "width", "height", "fps", "codec", "keyframes"}，失败返回 None
+    keyframes=True 时额外读取首个视频流的包信息 (只解复用不解码)，得到相对文件起点的关键帧时间戳表 (升序)
+    """
+    import json
+    entries = "format=duration,start_time:stream=width,height,r_frame_rate,codec_name"
+    if keyframes: entries += ":packet=pts_time,flags"
+    try:
+        cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', entries, '-of', 'json', video_path]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=_hidden_startupinfo())
+        data = json.loads(result.stdout or b"{}")
+        fmt = data.get("format", {})
+        stream = (data.get("streams") or [{}])[0]
+        start_time = float(fmt.get("start_time") or 0)
+        num, _, den = (stream.get("r_frame_rate") or "0/1").partition("/")
+        info = {
+            "duration": float(fmt["duration"]),
+            "start_time": start_time,
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+            "fps": float(num) / float(den or 1) if float(den or 1) else 0.0,
+            "codec": stream.get("codec_name"),
+            "keyframes": None,
+        }
+        if keyframes:
+            info["keyframes"] = sorted({round(float(p["pts_time"]) - start_time, 3) for p in data.get("packets", [])
+                                        if "K" in p.get("flags", "") and p.get("pts_time") not in (None, "N/A")})
+        return info
+    except:
+        return None
+
+_probe_memo = {}
+_probe_cache = None
+_probe_lock = threading.Lock()
+
+def video_info(video_path, keyframes=False):
+    """
+    带缓存的 probe_video：结果按 路径+大小+修改时间 保存在 cache/probe.sqlite3，重复运行不再调用 ffprobe
+    关键帧表在首次需要时读取并补入缓存；失败返回 None
+    """
+    global _probe_cache
+    from .probecache import ProbeCache
+    try:
+        key = ProbeCache.make_key(video_path)
+    except OSError:
+        return None
+    with _probe_lock:
+        info = _probe_memo.get(key)
+        if info is None:
+            try:
+                if _probe_cache is None:
+                    _probe_cache = ProbeCache(PROBE_CACHE_FILE)
+                info = _probe_cache.get(key)
+            except Exception: # 缓存不可用 (只读目录等) 时直接探测
+                info = None
+    if info is not None and (not keyframes or info.get("keyframes") is not None):
+        _probe_memo[key] = info
+        return info
+
+    fresh = probe_video(video_path, keyframes)
+    if fresh is None: return info
+    with _probe_lock:
+        _probe_memo[key] = fresh
+        try:
+            if _probe_cache is not None:
+                _probe_cache.put(key, fresh)
+        except Exception:
+            pass
+    return fresh
+
+def get_video_duration_ffmpeg(video_path):
+    info = video_info(video_path)
+    return info["duration"] if info else 0.0
+
+def get_video_size_ffmpeg(video_path):
+    """返回首个视频流的 (宽, 高)，失败返回 None"""
+    info = video_info(video_path)
+    if not info or not info["width"] or not info["height"]: return None
+    return int(info["width"]), int(info["height"])
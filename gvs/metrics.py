@@ -0,0 +1,134 @@
+"""
+单个任务的运行指标：各阶段耗时直方图、计数器、每批次 token 用量
+任务结束时导出 JSON 报告，可选导出 Prometheus 文本格式 (node_exporter textfile)
+"""
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# 直方图桶上限 (秒)
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """按桶估算分位数 (返回所在桶的上限)"""
+        if not self.count: return None
+        target, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "sum": round(self.sum, 4),
+                "avg": round(self.sum / self.count, 4) if self.count else None,
+                "min": self.min, "max": self.max, "p50": self.quantile(0.5), "p95": self.quantile(0.95),
+                "buckets": {str(b): c for b, c in zip(BUCKETS + ("+Inf",), self.counts)}}
+
+
+class Metrics:
+    """线程安全的指标收集器，供 SubtitleJob / AIClient 等各阶段共同写入"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.batches = []
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t)
+
+    def timed_iter(self, stage, iterable):
+        """逐项计时的迭代器包装 (例如解码等待下一帧的时间)，关闭时一并关闭原迭代器"""
+        it = iter(iterable)
+        try:
+            while True:
+                t = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                self.observe(stage, time.perf_counter() - t)
+                yield item
+        finally:
+            close = getattr(it, "close", None)
+            if close: close()
+
+    def inc(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_usage(self, start, end, prompt_tokens, completion_tokens):
+        """记录一个批次 (一次成功请求) 的 token 用量"""
+        with self.lock:
+            self.batches.append({"start": start, "end": end,
+                                 "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+            self.counters["prompt_tokens"] = self.counters.get("prompt_tokens", 0) + (prompt_tokens or 0)
+            self.counters["completion_tokens"] = self.counters.get("completion_tokens", 0) + (completion_tokens or 0)
+
+    def report(self, **info):
+        with self.lock:
+            return {**info,
+                    "started": self.started,
+                    "wall_s": round(time.time() - self.started, 3),
+                    "stages": {k: v.to_dict() for k, v in sorted(self.stages.items())},
+                    "counters": dict(sorted(self.counters.items())),
+                    "batches": sorted(self.batches, key=lambda b: b["start"])}
+
+    def write_json(self, path, **info):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**info), f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path, labels=None):
+        """Prometheus 文本格式：gvs_stage_seconds 直方图 + gvs_<计数器>_total"""
+        def fmt(extra=None):
+            pairs = {**(labels or {}), **(extra or {})}
+            inner = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs.items())
+            return "{" + inner + "}" if inner else ""
+
+        lines = ["# TYPE gvs_stage_seconds histogram"]
+        with self.lock:
+            for stage, hist in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, c in zip(BUCKETS + ("+Inf",), hist.counts):
+                    cumulative += c
+                    lines.append(f"gvs_stage_seconds_bucket{fmt({'stage': stage, 'le': bound})} {cumulative}")
+                lines.append(f"gvs_stage_seconds_sum{fmt({'stage': stage})} {hist.sum}")
+                lines.append(f"gvs_stage_seconds_count{fmt({'stage': stage})} {hist.count}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE gvs_{name}_total counter")
+                lines.append(f"gvs_{name}_total{fmt()} {value}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
@@ -0,0 +1,67 @@
+"""
+拼图模式：把同一批次的多张字幕条纵向拼成少量长图，每条上方加编号标签
+按字节预算自适应 JPEG 质量，超出时转为灰度；PIL 在函数内按需导入
+"""
+import io
+
+LABEL_HEIGHT = 28
+QUALITIES = (90, 80, 70, 60, 50)
+
+
+def _label_font():
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=20)
+    except TypeError: # Pillow < 10.1 只有固定大小的位图字体
+        return ImageFont.load_default()
+
+
+def _encode_budget(img, max_bytes):
+    """依次降低质量、再转灰度，返回首个不超过 max_bytes 的 (JPEG 字节, 质量, 是否灰度)；都超出时返回最小的一个"""
+    data = None
+    for gray in (False, True):
+        src = img.convert('L') if gray else img
+        for q in QUALITIES:
+            buf = io.BytesIO()
+            src.save(buf, format='JPEG', quality=q)
+            data = buf.getvalue()
+            if not max_bytes or len(data) <= max_bytes:
+                return data, q, gray
+    return data, QUALITIES[-1], True
+
+
+def pack_mosaic(images, labels, rows=10, width=1280, max_bytes=300 * 1024):
+    """
+    images: 每帧字幕条的 JPEG 字节；labels: 每条上方标签文字
+    每张拼图最多 rows 条，宽度统一缩放到不超过 width
+    返回 [{"image": JPEG 字节, "first": 首条序号(0 起), "rows": [(y0, y1), ...], "quality": q, "gray": bool}]
+    rows 为每条字幕条 (不含标签) 在拼图中的纵向范围
+    """
+    from PIL import Image, ImageDraw
+    strips = []
+    for data in images:
+        img = Image.open(io.BytesIO(data)).convert('RGB')
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.BILINEAR)
+        strips.append(img)
+
+    font = _label_font()
+    sheets = []
+    rows = max(1, int(rows))
+    for first in range(0, len(strips), rows):
+        group = strips[first:first + rows]
+        sheet_w = max(s.width for s in group)
+        sheet = Image.new('RGB', (sheet_w, sum(s.height + LABEL_HEIGHT for s in group)), (255, 255, 255))
+        draw = ImageDraw.Draw(sheet)
+        y = 0
+        offsets = []
+        for k, strip in enumerate(group):
+            draw.text((6, y + 4), labels[first + k], fill=(0, 0, 0), font=font)
+            y += LABEL_HEIGHT
+            sheet.paste(strip, (0, y))
+            offsets.append((y, y + strip.height))
+            y += strip.height
+        data, quality, gray = _encode_budget(sheet, max_bytes)
+        sheets.append({"image": data, "first": first,
+                       "rows": offsets, "quality": quality, "gray": gray})
+    return sheets
@@ -0,0 +1,53 @@
+"""
+低拷贝请求体：图片以原始 JPEG 字节保存到发送时，JSON 中的 base64 在发送时按块编码并直接写入连接，
+不在内存中生成完整的 base64 字符串和 JSON 请求体
+"""
+import base64
+import json
+import os
+
+# 每块原始字节数 (3 的倍数，各块的 base64 可直接拼接)
+CHUNK = 3 * 16 * 1024
+
+def b64_len(n):
+    """n 字节数据 base64 编码后的长度"""
+    return (n + 2) // 3 * 4
+
+def b64_chunks(data, chunk=CHUNK):
+    """逐块产出 data 的 base64 (bytes)，拼接结果与整体编码一致"""
+    view = memoryview(data)
+    for i in range(0, len(view), chunk):
+        yield base64.b64encode(view[i:i + chunk])
+
+
+class StreamingJSONBody:
+    """
+    可迭代的 JSON 请求体，传给 requests 的 data=
+    build(refs) 返回请求结构，refs[i] 为第 i 张图片的占位字符串，放在其 base64 应出现的位置 (按图片顺序出现)
+    迭代时依次产出 JSON 片段与图片的 base64 块；__len__ 为总字节数，requests 据此发送 Content-Length 而不是分块编码
+    可重复迭代 (重试时重新发送)
+    """
+    def __init__(self, build, images):
+        token = os.urandom(8).hex()
+        refs = [f"@@{token}:{i}@@" for i in range(len(images))]
+        text = json.dumps(build(refs), ensure_ascii=False)
+        self.images = images
+        self.parts = [] # JSON 片段 (bytes) 与图片序号交替
+        pos = 0
+        for i, ref in enumerate(refs):
+            at = text.index(ref, pos)
+            self.parts += [text[pos:at].encode('utf-8'), i]
+            pos = at + len(ref)
+        self.parts.append(text[pos:].encode('utf-8'))
+        self.length = (sum(len(p) for p in self.parts if isinstance(p, bytes))
+                       + sum(b64_len(len(img)) for img in images))
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, int):
+                yield from b64_chunks(self.images[part])
+            elif part:
+                yield part
@@ -0,0 +1,53 @@
+"""视频探测结果 (时长、帧率、分辨率、关键帧表) 的本地缓存"""
+import os
+import json
+import time
+import threading
+
+class ProbeCache:
+    """
+    ffprobe 结果的持久化缓存 (SQLite)
+    键为 绝对路径+文件大小+修改时间 的 sha256，文件被替换或修改后自动失效；超出 max_entries 后按最近使用淘汰
+    """
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        import sqlite3
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes (key TEXT PRIMARY KEY, info TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_probes_last_used ON probes(last_used)")
+
+    @staticmethod
+    def make_key(video_path):
+        """文件不存在时抛出 OSError"""
+        import hashlib
+        st = os.stat(video_path)
+        raw = f"{os.path.abspath(video_path)}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT info FROM probes WHERE key = ?", (key,)).fetchone()
+            if row is None: return None
+            with self.conn:
+                self.conn.execute("UPDATE probes SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def put(self, key, info):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO probes (key, info, last_used) VALUES (?, ?, ?)",
+                                  (key, json.dumps(info), time.time()))
+                self.conn.execute(
+                    "DELETE FROM probes WHERE key NOT IN (SELECT key FROM probes ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,138 @@
+"""按 服务商 + API Key 共享的自适应限流器"""
+import time
+import random
+import threading
+from collections import deque
+
+
+class RateLimiter:
+    """
+    单个服务商 + Key 的自适应限流器
+    - 令牌桶控制每分钟请求数 (rpm)；未配置时不限速，首次被限流后按最近实际请求速率的一半启用
+    - 并发上限按 AIMD 调整：成功后线性增加 (每轮约 +1)，被限流时减半；
+      同一轮中已发出的请求再被限流不重复减半
+    - 服务端给出 Retry-After 时，共享该 Key 的所有请求暂停到指定时间
+    """
+    def __init__(self, max_concurrency=2, rpm=0):
+        self.cond = threading.Condition()
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.max_rpm = float(rpm) if rpm else None
+        self.rpm = self.max_rpm
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.disabled_until = 0.0 # 额度用尽后停用到该时间
+        self.last_decrease = 0.0
+        self.history = deque() # 最近 60 秒内的请求开始时间
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.wait_time = 0.0
+
+    def acquire(self):
+        """阻塞直到允许发出一个请求，返回请求开始时间 (传回 release)"""
+        started = time.monotonic()
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= int(self.limit):
+                    wait = 1.0 # 等待 release 通知
+                elif self.rpm and self.tokens < 1:
+                    wait = (1 - self.tokens) * 60 / self.rpm
+                else:
+                    break
+                self.cond.wait(min(wait, 1.0))
+            if self.rpm:
+                self.tokens -= 1
+            self.in_flight += 1
+            self.history.append(now)
+            while self.history and now - self.history[0] > 60:
+                self.history.popleft()
+            self.requests += 1
+            self.wait_time += now - started
+            return now
+
+    def release(self, started, ok=True, throttled=False, retry_after=None):
+        """请求结束后调用：throttled=被限流 (429)，ok=False 为其它失败"""
+        with self.cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                if started > self.last_decrease:
+                    self.last_decrease = now
+                    self.limit = max(1.0, self.limit / 2)
+                    self.rpm = max(1.0, (self.rpm or self._observed_rpm(now)) / 2)
+                    self.tokens = min(self.tokens, 0.0)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            elif ok:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+                if self.rpm:
+                    self.rpm += 1
+                    if self.max_rpm:
+                        self.rpm = min(self.rpm, self.max_rpm)
+            else:
+                self.errors += 1
+            self.cond.notify_all()
+
+    def pause(self, seconds):
+        """暂停该 Key 的所有请求 seconds 秒"""
+        with self.cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def disable(self, seconds):
+        """额度用尽 / Key 失效：seconds 秒内共享该 Key 的所有请求不再发出"""
+        with self.cond:
+            self.disabled_until = max(self.disabled_until, time.monotonic() + seconds)
+            self.cond.notify_all()
+
+    @property
+    def disabled(self):
+        return time.monotonic() < self.disabled_until
+
+    def _observed_rpm(self, now):
+        """最近 60 秒内的实际请求速率 (窗口不足 1 秒按 1 秒计)"""
+        if not self.history: return 1.0
+        span = max(1.0, now - self.history[0])
+        return len(self.history) * 60 / span
+
+    def _refill(self, now):
+        if self.rpm:
+            burst = max(1.0, self.limit)
+            self.tokens = min(burst, self.tokens + (now - self.last_refill) * self.rpm / 60)
+        self.last_refill = now
+
+    def describe(self):
+        with self.cond:
+            rpm = f"{self.rpm:.0f}" if self.rpm else "-"
+            disabled = " disabled" if self.disabled else ""
+            return (f"requests={self.requests} throttled={self.throttled} errors={self.errors} "
+                    f"concurrency={int(self.limit)}/{self.max_concurrency} rpm={rpm} wait={self.wait_time:.1f}s{disabled}")
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """指数退避 + 全抖动：第 attempt 次重试在 [base, min(cap, base*2^attempt)] 内随机等待"""
+    return random.uniform(base, max(base, min(cap, base * (2 ** attempt))))
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider_idx, api_key, max_concurrency=2, rpm=0):
+    """
+    同一进程内相同 服务商 + Key 共享一个限流器 (多个任务/线程共用额度)
+    并发上限由首次创建时决定，之后的调用不会放宽 (否则一个任务就能改变其它任务共用的额度)
+    """
+    import hashlib
+    key = (provider_idx, hashlib.sha256(api_key.encode('utf-8')).hexdigest())
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(max_concurrency, rpm)
+        return limiter
@@ -0,0 +1,45 @@
+"""
+字幕起止时间的亚秒级校准：AI 返回的时间是整秒采样点，真实切换发生在前一采样点与该点之间
+对每个边界在本地以高帧率解码这一秒的字幕区域，取相邻帧差异最大的位置作为切换时刻，不增加 API 调用
+"""
+from .media import iter_frames_stream, frame_signature, change_ratio
+
+def find_change(video_path, crop, t, fps=25, min_change=0.002):
+    """
+    在 (t-1, t] 内逐帧比较字幕区域，返回变化最大的那一帧的时间戳
+    窗口内没有明显变化 (渐变、解码失败) 时返回 None
+    """
+    start = max(0.0, t - 1)
+    best, best_ts, prev = 0.0, None, None
+    for ts, img in iter_frames_stream(video_path, crop, fps=fps, start=start, duration=t - start + 1.5 / fps):
+        sig = frame_signature(img)
+        ratio = change_ratio(prev, sig) if prev is not None else 0.0
+        if ratio > best:
+            best, best_ts = ratio, ts
+        prev = sig
+    if best_ts is None or best < min_change: return None
+    return min(best_ts, t)
+
+def refine_boundaries(video_path, crop, subtitles, fps=25, workers=2, is_running=lambda: True):
+    """
+    原地校准 subtitles 中每条的 start/end，返回被校准的边界数
+    相邻字幕共用的边界只解码一次；校准后时长过短 (<0.2 秒) 的条目保持原值
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    points = sorted({t for s in subtitles for t in (s["start"], s["end"]) if t > 0})
+    if not points: return 0
+
+    def probe(t):
+        return find_change(video_path, crop, t, fps) if is_running() else None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        refined = dict(zip(points, pool.map(probe, points)))
+
+    changed = 0
+    for s in subtitles:
+        new_start = refined.get(s["start"]) or s["start"]
+        new_end = refined.get(s["end"]) or s["end"]
+        if new_end - new_start < 0.2: continue
+        changed += (new_start != s["start"]) + (new_end != s["end"])
+        s["start"], s["end"] = new_start, new_end
+    return changed
@@ -0,0 +1,117 @@
+"""
+多 Key / 多服务商路由：同一服务商的多个 Key 按剩余并发与实际耗时分配批次，
+额度用尽的 Key 移出轮换，全部用尽后切换到备用服务商 (如 智谱 → Gemini)
+"""
+import time
+import threading
+
+from .ai import AIClient
+from .config import CONFIG_KEYS, DEFAULT_MODELS, PROVIDERS, load_config
+from .i18n import tr
+
+
+class Route:
+    def __init__(self, client, tier):
+        self.client = client
+        self.tier = tier # 0=主服务商，1=备用
+        self.pending = 0 # 本路由上尚未返回的批次
+        self.latency = None # 每批耗时的指数滑动平均 (秒)
+
+    def score(self):
+        """剩余并发 / 平均耗时，越大越优先；被限流暂停时只按耗时排序"""
+        limiter = self.client.limiter
+        free = 0 if time.monotonic() < limiter.paused_until else max(0, int(limiter.limit) - self.pending)
+        return (free + 0.1) / (self.latency or 1.0)
+
+
+class AIRouter:
+    """
+    与 AIClient 相同的 chat_smart_batch 接口
+    每个批次交给当前层级 (主服务商优先) 中得分最高的 Key；Key 因额度用尽被停用时，
+    同一批次立即改派其它 Key，而不是在原 Key 上等待重试
+    成功结果的每一条都带上 source (服务商:模型:Key 末 4 位)
+    """
+    def __init__(self, clients, log):
+        self.routes = [Route(c, tier) for c, tier in clients]
+        self.log = log
+        self.lock = threading.Lock()
+        self.tier = 0
+
+    @property
+    def multi(self):
+        return len(self.routes) > 1
+
+    @property
+    def exhausted(self):
+        """所有 Key 都已停用"""
+        return all(r.client.limiter.disabled for r in self.routes)
+
+    def pick(self, exclude=()):
+        with self.lock:
+            active = [r for r in self.routes if r not in exclude and not r.client.limiter.disabled]
+            if not active: return None
+            tier = min(r.tier for r in active)
+            if tier > self.tier:
+                self.tier = tier
+                self.log(tr("route_failover").format(", ".join(r.client.label for r in active if r.tier == tier)))
+            route = max((r for r in active if r.tier == tier), key=lambda r: (r.score(), -r.pending))
+            route.pending += 1
+            return route
+
+    def chat_smart_batch(self, spans, split_on_timeout=False, salvage=True):
+        tried = []
+        while True:
+            route = self.pick(tried)
+            if route is None: return None
+            started = time.monotonic()
+            try:
+                data = route.client.chat_smart_batch(spans, split_on_timeout, salvage)
+            finally:
+                with self.lock:
+                    route.pending -= 1
+            if data is not None:
+                elapsed = time.monotonic() - started
+                with self.lock:
+                    route.latency = elapsed if route.latency is None else route.latency * 0.7 + elapsed * 0.3
+                for item in data:
+                    if isinstance(item, dict):
+                        item.setdefault("source", route.client.label)
+                return data
+            if not route.client.limiter.disabled:
+                return None # 普通失败交由调用方拆分重试
+            tried.append(route)
+
+    def describe(self):
+        return "; ".join(r.client.describe() for r in self.routes)
+
+    def close(self):
+        for r in self.routes:
+            r.client.close()
+
+
+def build_router(provider_idx, api_key, model, options, log, **client_args):
+    """
+    按高级选项创建路由：主 Key + extra_keys (同一服务商、同一模型)，再加 fallback_routes
+    fallback_routes 每项 {"provider": "gemini", "model": 可选, "key": 可选 (默认取 config.json), "api_base": 可选}
+    client_args 为 AIClient 的其余参数 (cache / pool_size / timeout / metrics ...)，其中 api_base 只用于主服务商，
+    备用服务商接口格式不同，使用各自的 api_base (未设置时为官方地址)
+    """
+    api_base = client_args.pop("api_base", None)
+    specs = [(provider_idx, key, model, api_base, 0) for key in [api_key] + list(options.get("extra_keys") or [])]
+    cfg = None
+    for route in options.get("fallback_routes") or []:
+        provider = route.get("provider", 1)
+        idx = PROVIDERS[provider] if isinstance(provider, str) else int(provider)
+        key = route.get("key")
+        if not key:
+            cfg = cfg if cfg is not None else load_config()
+            key = cfg.get(CONFIG_KEYS[idx], "")
+        if key:
+            specs.append((idx, key, route.get("model") or DEFAULT_MODELS[idx], route.get("api_base") or None, 1))
+
+    clients, seen = [], set()
+    for idx, key, route_model, route_base, tier in specs:
+        if not key or (idx, key, route_model, route_base) in seen: continue
+        seen.add((idx, key, route_model, route_base))
+        clients.append((AIClient(idx, key, route_model, log, api_base=route_base, **client_args), tier))
+    return AIRouter(clients, log)
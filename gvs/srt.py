@@ -0,0 +1,57 @@
+"""SRT 时间格式与增量写入"""
+import os
+from datetime import timedelta
+
+def ms_to_srt_time(seconds):
+    td = timedelta(seconds=seconds)
+    total_seconds = int(td.total_seconds())
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    secs = total_seconds % 60
+    millis = int(td.microseconds / 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
+
+
+class SrtWriter:
+    """
+    增量写入 SRT：定稿的字幕条追加到 <path>.part 并 fsync，进程崩溃也不会丢失已写出的部分
+    finish() 时原子重命名为 path；未完成的任务保留 .part 文件
+    sources=True 时同步写出 <字幕名>.sources.tsv (序号、起止时间、识别来源)
+    """
+    def __init__(self, path, sources=False):
+        self.path = path
+        self.part_path = path + ".part"
+        self.sources_path = os.path.splitext(path)[0] + ".sources.tsv" if sources else None
+        self.count = 0
+        self.f = open(self.part_path, "w", encoding="utf-8")
+        self.sources = open(self.sources_path + ".part", "w", encoding="utf-8") if sources else None
+
+    def write(self, cues):
+        if not cues: return
+        for s in cues:
+            self.count += 1
+            self.f.write(f"{self.count}\n{ms_to_srt_time(s['start'])} --> {ms_to_srt_time(s['end'])}\n{s['text']}\n\n")
+            if self.sources:
+                self.sources.write(f"{self.count}\t{ms_to_srt_time(s['start'])}\t{ms_to_srt_time(s['end'])}\t{s.get('source') or ''}\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        if self.sources:
+            self.sources.flush()
+
+    def finish(self):
+        """关闭并原子替换为正式文件，返回路径"""
+        self.close()
+        os.replace(self.part_path, self.path)
+        if self.sources_path:
+            os.replace(self.sources_path + ".part", self.sources_path)
+        return self.path
+
+    def close(self, remove=False):
+        if not self.f.closed:
+            self.f.close()
+        if self.sources and not self.sources.closed:
+            self.sources.close()
+        if remove:
+            for path in (self.part_path, self.sources_path and self.sources_path + ".part"):
+                if path and os.path.exists(path):
+                    os.remove(path)
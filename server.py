@@ -0,0 +1,353 @@
+"""
+GVS 任务服务：常驻进程，通过本地 HTTP 接口接收视频任务，固定数量的工作线程依次处理
+
+多人共用一台提取机器时使用：所有任务在同一进程内运行，相同 服务商 + Key 共享一个限流器 (额度)；
+任务队列持久化到 输出目录/gvs-jobs.json，服务重启后未完成的任务重新排队 (配合断点续传从中断处继续)。
+
+用法:
+    python server.py --port 8790 --workers 2
+    python server.py --host 0.0.0.0 --token 密钥 --set workers=4
+
+接口 (JSON):
+    POST   /jobs              提交任务 {"video": 路径, "provider": "zhipu|gemini", "model", "region", "key", "options": {}}
+    GET    /jobs              任务列表
+    GET    /jobs/<id>         任务状态，progress 为 [当前秒, 总秒数]，log 为最近的日志
+    POST   /jobs/<id>/cancel  取消 (排队中的直接取消，运行中的停止)；DELETE /jobs/<id> 同
+    GET    /jobs/<id>/srt     下载生成的 SRT
+设置 --token 后，请求需带 Authorization: Bearer <token>
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cli import parse_option
+from gvs.config import (CONFIG_KEYS, DEFAULT_MODELS, DEFAULT_OPTIONS, ENV_KEYS, OUTPUT_DIR, PROVIDERS, ensure_dir,
+                        load_config, option_keys, options_from_config, redact_options, redact_text)
+from gvs.i18n import TRANS
+from gvs.job import SubtitleJob
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+LOG_TAIL = 200 # 状态接口返回的最近日志行数
+# 提交任务时允许覆盖的高级选项 (只影响本任务的处理方式)
+# 服务地址、其它 Key 与备用服务商 (可能把服务端的 Key 发往别处)、并发数与共享的限流、缓存、进程级调试日志只能在服务端设置
+JOB_OPTIONS = {
+    "extract_mode", "decode_workers", "decode_segment_min", "dedup", "dedup_threshold", "prefilter",
+    "prefilter_threshold", "refine_boundaries", "refine_fps", "cache", "resume", "connect_timeout",
+    "read_timeout", "max_retries", "batch_size", "batch_min_frames", "batch_max_frames", "batch_max_mb",
+    "batch_max_tokens", "batch_target_latency", "auto_band_samples", "metrics_report", "metrics_prometheus",
+    "mosaic", "mosaic_rows", "mosaic_width", "mosaic_max_kb",
+}
+
+
+class JobStore:
+    """
+    持久化的任务队列 (JSON 文件，每次变更整体原子替换)
+    运行中的 SubtitleJob、日志尾部等只在内存中
+    """
+    def __init__(self, path):
+        self.path = path
+        self.cond = threading.Condition()
+        self.jobs = {}
+        self.running = {} # id -> SubtitleJob
+        self.logs = {}    # id -> deque
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                jobs = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        for job in jobs:
+            # 上次退出时仍在运行的任务重新排队
+            if job["state"] == RUNNING:
+                job["state"] = QUEUED
+            self.jobs[job["id"]] = job
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sorted(self.jobs.values(), key=lambda j: j["created"]), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def submit(self, spec):
+        job = {"id": uuid.uuid4().hex[:12], "state": QUEUED, "created": time.time(),
+               "started": None, "finished": None, "progress": [0, 0], "srt": None, "error": None, **spec}
+        with self.cond:
+            self.jobs[job["id"]] = job
+            self.save()
+            self.cond.notify()
+        return job
+
+    def next_job(self, stop):
+        """阻塞直到有排队任务，按提交顺序取出并标记为运行中；stop 置位时返回 None"""
+        with self.cond:
+            while not stop.is_set():
+                queued = [j for j in self.jobs.values() if j["state"] == QUEUED]
+                if queued:
+                    job = min(queued, key=lambda j: j["created"])
+                    job.update(state=RUNNING, started=time.time(), progress=[0, 0], error=None)
+                    self.logs[job["id"]] = deque(maxlen=LOG_TAIL)
+                    self.save()
+                    return job
+                self.cond.wait(1.0)
+        return None
+
+    def finish(self, job_id, srt_path, error=None):
+        with self.cond:
+            job = self.jobs[job_id]
+            self.running.pop(job_id, None)
+            if job["state"] == CANCELLED:
+                pass
+            elif srt_path:
+                job.update(state=DONE, srt=srt_path)
+            else:
+                job.update(state=FAILED, error=error or "no subtitles (see log)")
+            job["finished"] = time.time()
+            self.save()
+
+    def cancel(self, job_id):
+        """返回取消后的任务，不存在返回 None"""
+        with self.cond:
+            job = self.jobs.get(job_id)
+            if job is None: return None
+            if job["state"] in (QUEUED, RUNNING):
+                job.update(state=CANCELLED, finished=time.time())
+                runner = self.running.get(job_id)
+                if runner: runner.stop()
+                self.save()
+            return job
+
+    def status(self, job_id):
+        with self.cond:
+            job = self.jobs.get(job_id)
+            if job is None: return None
+            return {**self.public(job), "log": list(self.logs.get(job_id, ()))}
+
+    def list(self):
+        with self.cond:
+            return [self.public(j) for j in sorted(self.jobs.values(), key=lambda j: j["created"])]
+
+    @staticmethod
+    def public(job):
+        """不对外返回 API Key (包括高级选项中的 extra_keys / fallback_routes)"""
+        return {**{k: v for k, v in job.items() if k != "key"}, "options": redact_options(job.get("options"))}
+
+
+class JobServer:
+    def __init__(self, store, workers, output_dir, options):
+        self.store = store
+        self.output_dir = output_dir
+        self.options = options
+        self.stop_event = threading.Event()
+        self.threads = [threading.Thread(target=self.worker, name=f"gvs-worker-{i}", daemon=True)
+                        for i in range(max(1, workers))]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def shutdown(self):
+        """停止取新任务并中止运行中的任务 (保持 running 状态，下次启动时重新排队续传)"""
+        self.stop_event.set()
+        with self.store.cond:
+            for runner in self.store.running.values():
+                runner.stop()
+            self.store.cond.notify_all()
+        for t in self.threads:
+            t.join(10)
+
+    def worker(self):
+        while True:
+            job = self.store.next_job(self.stop_event)
+            if job is None: return
+            self.run_job(job)
+
+    def run_job(self, job):
+        job_id = job["id"]
+        job_dir = ensure_dir(os.path.join(self.output_dir, job_id))
+        log_tail = self.store.logs[job_id]
+        keys = [job["key"]] + option_keys(self.options)
+
+        with open(os.path.join(job_dir, "job.log"), "a", encoding="utf-8") as f:
+            def log(s):
+                # 日志尾部会通过 GET /jobs/<id> 返回，写入前去掉 Key
+                line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {redact_text(s, keys)}"
+                log_tail.append(line)
+                f.write(line + "\n")
+                f.flush()
+
+            def progress(current, total):
+                job["progress"] = [current, total]
+
+            srt_path, error = None, None
+            try:
+                runner = SubtitleJob(job["video"], job["region"], job["key"], job["model"], job["provider"],
+                                     # 旧版本保存的任务可能带有不允许的选项，同样忽略
+                                     {**self.options, **{k: v for k, v in job.get("options", {}).items() if k in JOB_OPTIONS}},
+                                     log=log, progress=progress, output_dir=job_dir)
+                with self.store.cond:
+                    if job["state"] == CANCELLED: return self.store.finish(job_id, None)
+                    self.store.running[job_id] = runner
+                srt_path = runner.run()
+            except Exception as e:
+                error = redact_text(e, keys)
+                log(traceback.format_exc())
+        if self.stop_event.is_set() and not srt_path:
+            return # 服务退出导致的中止，保持运行中状态
+        self.store.finish(job_id, srt_path, error)
+
+
+def job_spec(body, cfg):
+    """把提交的 JSON 规范化为任务记录，参数错误时抛出 ValueError"""
+    video = body.get("video")
+    if not video or not os.path.isfile(video):
+        raise ValueError(f"video not found: {video}")
+    provider = body.get("provider", int(cfg.get("provider_idx", 0)))
+    provider_idx = PROVIDERS.get(provider) if isinstance(provider, str) else provider
+    if provider_idx not in DEFAULT_MODELS:
+        raise ValueError(f"unknown provider: {provider}")
+    region = int(body.get("region", cfg.get("region_idx", 1)))
+    if not 0 <= region < len(TRANS["en"]["regions"]):
+        raise ValueError(f"unknown region: {region}")
+    options = body.get("options") or {}
+    if not isinstance(options, dict):
+        raise ValueError("options must be an object")
+    unknown = [k for k in options if k not in DEFAULT_OPTIONS]
+    if unknown:
+        raise ValueError(f"unknown options: {', '.join(unknown)}")
+    denied = [k for k in options if k not in JOB_OPTIONS]
+    if denied:
+        raise ValueError(f"options not allowed per job: {', '.join(denied)}")
+    key = body.get("key") or os.environ.get(ENV_KEYS[provider_idx]) or cfg.get(CONFIG_KEYS[provider_idx], "")
+    if not key:
+        raise ValueError("missing API key")
+    cfg_model = cfg.get("model") if provider_idx == int(cfg.get("provider_idx", 0)) else None
+    return {"video": os.path.abspath(video), "provider": provider_idx, "region": region,
+            "model": body.get("model") or cfg_model or DEFAULT_MODELS[provider_idx], "key": key, "options": options}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def authorized(self):
+        token = self.server.token
+        if token and self.headers.get("Authorization") != f"Bearer {token}":
+            self.reply(401, {"error": "unauthorized"})
+            return False
+        return True
+
+    def route(self):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if not parts or parts[0] != "jobs": return None, None
+        return (parts[1] if len(parts) > 1 else None), (parts[2] if len(parts) > 2 else None)
+
+    def do_GET(self):
+        if not self.authorized(): return
+        store = self.server.store
+        job_id, action = self.route()
+        if job_id is None:
+            if self.path.split("?")[0].rstrip("/") != "/jobs":
+                return self.reply(404, {"error": "not found"})
+            return self.reply(200, store.list())
+        status = store.status(job_id)
+        if status is None:
+            return self.reply(404, {"error": "job not found"})
+        if action is None:
+            return self.reply(200, status)
+        if action != "srt":
+            return self.reply(404, {"error": "not found"})
+        if status["state"] != DONE or not status["srt"] or not os.path.exists(status["srt"]):
+            return self.reply(409, {"error": f"job is {status['state']}"})
+        with open(status["srt"], "rb") as f:
+            data = f.read()
+        name = os.path.basename(status["srt"]).encode("ascii", "replace").decode("ascii")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-subrip; charset=utf-8")
+        self.send_header("Content-Disposition", f'attachment; filename="{name}"')
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.authorized(): return
+        job_id, action = self.route()
+        if job_id and action == "cancel":
+            return self.cancel(job_id)
+        if job_id or self.path.split("?")[0].rstrip("/") != "/jobs":
+            return self.reply(404, {"error": "not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            spec = job_spec(body, load_config())
+        except (ValueError, TypeError, AttributeError) as e:
+            return self.reply(400, {"error": str(e)})
+        job = self.server.store.submit(spec)
+        self.reply(201, JobStore.public(job))
+
+    def do_DELETE(self):
+        if not self.authorized(): return
+        job_id, action = self.route()
+        if not job_id or action:
+            return self.reply(404, {"error": "not found"})
+        self.cancel(job_id)
+
+    def cancel(self, job_id):
+        job = self.server.store.cancel(job_id)
+        if job is None:
+            return self.reply(404, {"error": "job not found"})
+        self.reply(200, JobStore.public(job))
+
+    def reply(self, status, obj):
+        payload = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址 (默认只允许本机访问)")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("-w", "--workers", type=int, default=2, help="同时处理的任务数")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help="输出目录 (每个任务一个子目录)")
+    parser.add_argument("--token", default=os.environ.get("GVS_SERVER_TOKEN"), help="访问令牌 (也可用环境变量 GVS_SERVER_TOKEN)")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_option, default=[],
+                        metavar="KEY=VALUE", help="覆盖所有任务的高级选项，可重复")
+    args = parser.parse_args(argv)
+
+    ensure_dir(args.output_dir)
+    options = options_from_config(load_config())
+    options.update(dict(args.overrides))
+    store = JobStore(os.path.join(args.output_dir, "gvs-jobs.json"))
+    jobs = JobServer(store, args.workers, args.output_dir, options)
+    jobs.start()
+
+    httpd = ThreadingHTTPServer((args.host, args.port), Handler)
+    httpd.daemon_threads = True
+    httpd.store = store
+    httpd.token = args.token
+    print(f"GVS server: http://{args.host}:{httpd.server_address[1]}  workers={args.workers}  (Ctrl+C 退出)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        jobs.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())